@@ -1,20 +1,189 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import tkinter.font as tkfont
 import pandas as pd
-import ast
 import json
+import queue
+import threading
+import time
 from tkinter.scrolledtext import ScrolledText
 
+from cizelge import Schedule
+from cozucu import BACKENDS, MipBackend
+from proje import CourseScheduler
+from veri import DataSource, parse_matrix
+from zaman import TimeGrid, minutes
+
+class VirtualList(ttk.Frame):
+    # Listbox that only ever holds the rows currently on screen: the items
+    # live in a Python list and the scrollbar moves a window over the rows
+    # matching the search box, so a catalog of thousands of rows costs one
+    # screenful of widget items. Indices given and returned are item indices.
+    def __init__(self, parent, on_select=None, width=30):
+        super().__init__(parent)
+        self.on_select = on_select
+        self.items = []     # display text of every item
+        self.keys = []      # casefolded text, for searching
+        self.rows = []      # item indices matching the search, in order
+        self.query = ''
+        self.offset = 0     # first row on screen
+        self.selected = None
+        
+        self.search = tk.StringVar()
+        self.search.trace_add('write', lambda *args: self.apply_filter())
+        ttk.Entry(self, textvariable=self.search, width=width).pack(fill='x', pady=(0, 5))
+        
+        body = ttk.Frame(self)
+        body.pack(fill='both', expand=True)
+        self.scrollbar = ttk.Scrollbar(body, orient='vertical', command=self.yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.listbox = tk.Listbox(body, width=width, exportselection=False)
+        self.listbox.pack(side='left', fill='both', expand=True)
+        self.listbox.bind('<<ListboxSelect>>', self.on_listbox_select)
+        self.listbox.bind('<Configure>', lambda event: self.redraw())
+        self.listbox.bind('<MouseWheel>', lambda event: self.yview('scroll', -event.delta // 120, 'units'))
+        self.listbox.bind('<Button-4>', lambda event: self.yview('scroll', -3, 'units'))
+        self.listbox.bind('<Button-5>', lambda event: self.yview('scroll', 3, 'units'))
+        self.line_height = tkfont.nametofont(self.listbox.cget('font')).metrics('linespace') + 1
+    
+    def page_size(self):
+        return max(1, self.listbox.winfo_height() // self.line_height)
+    
+    def set_items(self, items):
+        self.items = [str(item) for item in items]
+        self.keys = [item.casefold() for item in self.items]
+        self.query = None
+        self.apply_filter()
+    
+    def apply_filter(self):
+        query = self.search.get().casefold()
+        if self.query is not None and query.startswith(self.query):
+            # Typing on narrows the current matches
+            candidates = self.rows
+        else:
+            candidates = range(len(self.items))
+        self.rows = [idx for idx in candidates if query in self.keys[idx]]
+        self.query = query
+        self.offset = 0
+        self.redraw()
+    
+    def redraw(self):
+        size = self.page_size()
+        self.offset = max(0, min(self.offset, len(self.rows) - size))
+        window = self.rows[self.offset:self.offset + size]
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *(self.items[idx] for idx in window))
+        if self.selected in window:
+            self.listbox.selection_set(window.index(self.selected))
+        if self.rows:
+            self.scrollbar.set(self.offset / len(self.rows), (self.offset + len(window)) / len(self.rows))
+        else:
+            self.scrollbar.set(0, 1)
+    
+    def yview(self, action, amount, unit=None):
+        size = self.page_size()
+        if action == 'moveto':
+            self.offset = int(float(amount) * len(self.rows))
+        elif action == 'scroll':
+            self.offset += int(amount) * (size if unit == 'pages' else 1)
+        self.redraw()
+    
+    def on_listbox_select(self, event):
+        if self.listbox.curselection():
+            self.selected = self.rows[self.offset + self.listbox.curselection()[0]]
+            if self.on_select is not None:
+                self.on_select(self.selected)
+    
+    def select(self, idx):
+        # Select an item and scroll it into view (clearing a search that hides it)
+        if idx not in self.rows:
+            self.search.set('')
+        self.selected = idx
+        position = self.rows.index(idx)
+        if not self.offset <= position < self.offset + self.page_size():
+            self.offset = position
+        self.redraw()
+    
+    def clear_selection(self):
+        self.selected = None
+        self.listbox.selection_clear(0, tk.END)
+    
+    def set_item(self, idx, text):
+        self.items[idx] = str(text)
+        self.keys[idx] = self.items[idx].casefold()
+        self.redraw()
+
+class SolveCancelled(Exception):
+    pass
+
+class SolveJob:
+    # Builds and solves a copy of the tables in a worker thread so the Tk
+    # mainloop keeps running. Progress is put on self.events as (kind, value):
+    # ('phase', name), ('incumbent', objective), and finally one of
+    # ('done', schedule), ('failed', status), ('cancelled', None) or
+    # ('error', message).
+    def __init__(self, tables, backend, grid=None):
+        self.tables = {table: df.copy() for table, df in tables.items()}
+        self.backend = backend
+        self.grid = grid
+        self.events = queue.Queue()
+        self.cancel_requested = threading.Event()
+        self.start_time = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+    
+    def start(self):
+        self.start_time = time.time()
+        self.thread.start()
+    
+    def cancel(self):
+        # Stops the build at the next phase, or the solver if it is running
+        self.cancel_requested.set()
+        self.backend.cancel()
+    
+    def elapsed(self):
+        return time.time() - self.start_time
+    
+    def on_phase(self, name):
+        if self.cancel_requested.is_set():
+            raise SolveCancelled()
+        self.events.put(('phase', name))
+    
+    def run(self):
+        try:
+            self.events.put(('phase', 'preprocess'))
+            scheduler = CourseScheduler(solution_path=None, tables=self.tables, grid=self.grid)
+            scheduler.report.listener = self.on_phase
+            self.backend.on_incumbent = lambda objective, bound: self.events.put(('incumbent', objective))
+            solution = self.backend.solve(scheduler)
+            if solution.found:
+                # A cancelled solve still returns its best schedule so far
+                self.events.put(('done', Schedule(scheduler, solution)))
+            elif self.cancel_requested.is_set():
+                self.events.put(('cancelled', None))
+            else:
+                self.events.put(('failed', solution.status))
+        except SolveCancelled:
+            self.events.put(('cancelled', None))
+        except Exception as e:
+            self.events.put(('error', str(e)))
+
 class DataEditor:
-    def __init__(self, root):
+    def __init__(self, root, source=None, grid=None):
         self.root = root
         self.root.title("Course Scheduler Data Editor")
         self.root.geometry("1200x800")
         
-        # Initialize data
-        self.courses_df = pd.read_csv('courses.csv')
-        self.rooms_df = pd.read_csv('rooms.csv')
-        self.teachers_df = pd.read_csv('teachers.csv')
+        # Initialize data (CSV files by default, see veri.DataSource)
+        self.source = source or DataSource()
+        self.grid = grid or TimeGrid()
+        tables = self.source.read_tables()
+        self.courses_df = tables['courses']
+        self.rooms_df = tables['rooms']
+        self.teachers_df = tables['teachers']
+        
+        # Tables edited since the last save; only these are written
+        self.dirty = set()
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
         
         # Create main notebook
         self.notebook = ttk.Notebook(root)
@@ -33,10 +202,28 @@ class DataEditor:
         self.setup_courses_tab()
         self.setup_rooms_tab()
         self.setup_teachers_tab()
+        self.setup_timetable_tab()
         
-        # Add save button
-        save_button = ttk.Button(root, text="Save All Changes", command=self.save_all_changes)
-        save_button.pack(pady=10)
+        # Add save and solve controls
+        controls = ttk.Frame(root)
+        controls.pack(fill='x', padx=10, pady=10)
+        ttk.Button(controls, text="Save All Changes", command=self.save_all_changes).pack(side='left')
+        
+        self.backend_var = tk.StringVar(value=MipBackend.name)
+        ttk.Combobox(controls, textvariable=self.backend_var, values=sorted(BACKENDS),
+                     state='readonly', width=10).pack(side='left', padx=(20, 5))
+        self.solve_button = ttk.Button(controls, text="Solve", command=self.start_solve)
+        self.solve_button.pack(side='left')
+        self.cancel_button = ttk.Button(controls, text="Cancel", command=self.cancel_solve, state='disabled')
+        self.cancel_button.pack(side='left', padx=5)
+        self.solve_progress = ttk.Progressbar(controls, mode='indeterminate', length=120)
+        self.solve_progress.pack(side='left', padx=5)
+        self.solve_status = tk.StringVar()
+        ttk.Label(controls, textvariable=self.solve_status).pack(side='left', padx=5)
+        
+        # Running solve, if any (see SolveJob)
+        self.job = None
+        self.schedule = None
 
     def setup_courses_tab(self):
         # Create frames
@@ -46,16 +233,15 @@ class DataEditor:
         edit_frame = ttk.Frame(self.courses_tab)
         edit_frame.pack(side='left', fill='both', expand=True, padx=5, pady=5)
         
-        # Create course listbox
-        self.courses_listbox = tk.Listbox(list_frame, width=30)
-        self.courses_listbox.pack(fill='y', expand=True)
+        # Create course list (with a search box on top)
+        self.courses_list = VirtualList(list_frame, on_select=self.on_course_select)
+        self.courses_list.pack(fill='y', expand=True)
         
         # Store the currently selected index
         self.current_course_index = None
         
-        # Populate listbox
-        for course in self.courses_df['name']:
-            self.courses_listbox.insert(tk.END, course)
+        # Populate list
+        self.courses_list.set_items(self.courses_df['name'])
         
         # Create edit fields
         labels = ['Name:', 'Hours:', 'Students:', 'Possible Teachers:', 'Is Elective:', 'Course Year:']
@@ -84,9 +270,6 @@ class DataEditor:
         ttk.Button(edit_frame, text="New Course", command=self.new_course).grid(row=row, column=0, pady=10)
         ttk.Button(edit_frame, text="Update Course", command=self.update_course).grid(row=row, column=1, pady=10)
         ttk.Button(edit_frame, text="Delete Course", command=self.delete_course).grid(row=row, column=2, pady=10)
-        
-        # Bind the selection event after creating all variables
-        self.courses_listbox.bind('<<ListboxSelect>>', self.on_course_select)
 
     def setup_rooms_tab(self):
         # Create frames
@@ -96,14 +279,12 @@ class DataEditor:
         edit_frame = ttk.Frame(self.rooms_tab)
         edit_frame.pack(side='left', fill='both', expand=True, padx=5, pady=5)
         
-        # Create room listbox
-        self.rooms_listbox = tk.Listbox(list_frame, width=30)
-        self.rooms_listbox.pack(fill='y', expand=True)
-        self.rooms_listbox.bind('<<ListboxSelect>>', self.on_room_select)
+        # Create room list (with a search box on top)
+        self.rooms_list = VirtualList(list_frame, on_select=self.on_room_select)
+        self.rooms_list.pack(fill='y', expand=True)
         
-        # Populate listbox
-        for room in self.rooms_df['name']:
-            self.rooms_listbox.insert(tk.END, room)
+        # Populate list
+        self.rooms_list.set_items(self.rooms_df['name'])
         
         # Create edit fields
         self.room_vars = {
@@ -133,14 +314,12 @@ class DataEditor:
         edit_frame = ttk.Frame(self.teachers_tab)
         edit_frame.pack(side='left', fill='both', expand=True, padx=5, pady=5)
         
-        # Create teacher listbox
-        self.teachers_listbox = tk.Listbox(list_frame, width=30)
-        self.teachers_listbox.pack(fill='y', expand=True)
-        self.teachers_listbox.bind('<<ListboxSelect>>', self.on_teacher_select)
+        # Create teacher list (with a search box on top)
+        self.teachers_list = VirtualList(list_frame, on_select=self.on_teacher_select)
+        self.teachers_list.pack(fill='y', expand=True)
         
-        # Populate listbox
-        for teacher in self.teachers_df['name']:
-            self.teachers_listbox.insert(tk.END, teacher)
+        # Populate list
+        self.teachers_list.set_items(self.teachers_df['name'])
         
         # Create basic edit fields
         self.teacher_vars = {
@@ -172,42 +351,157 @@ class DataEditor:
         ttk.Button(edit_frame, text="Update Teacher", command=self.update_teacher).grid(row=row, column=1, pady=10)
         ttk.Button(edit_frame, text="Delete Teacher", command=self.delete_teacher).grid(row=row, column=2, pady=10)
 
-    def on_course_select(self, event):
-        if self.courses_listbox.curselection():
-            idx = self.courses_listbox.curselection()[0]
-            self.current_course_index = idx  # Store the current index
-            course = self.courses_df.iloc[idx]
-            
-            # Update all variables with current values
-            self.course_vars['name'].set(str(course['name']))
-            self.course_vars['hours'].set(str(course['hours']))
-            self.course_vars['students'].set(str(course['students']))
-            self.course_vars['possible_teachers'].set(str(course['possible_teachers']))
-            self.course_vars['is_elective'].set(str(course['is_elective']))
-            self.course_vars['course_year'].set(str(course['course_year']))
+    def setup_timetable_tab(self):
+        self.timetable_tab = ttk.Frame(self.notebook)
+        self.notebook.add(self.timetable_tab, text='Timetable')
+        
+        # Pick a view (cohort, teacher or room) and one of its members
+        select_frame = ttk.Frame(self.timetable_tab)
+        select_frame.pack(fill='x', padx=5, pady=5)
+        self.timetable_view = tk.StringVar(value='Cohort')
+        self.timetable_key = tk.StringVar()
+        view_box = ttk.Combobox(select_frame, textvariable=self.timetable_view,
+                                values=['Cohort', 'Teacher', 'Room'], state='readonly', width=10)
+        view_box.pack(side='left')
+        self.timetable_keys = ttk.Combobox(select_frame, textvariable=self.timetable_key,
+                                           state='readonly', width=40)
+        self.timetable_keys.pack(side='left', padx=5)
+        view_box.bind('<<ComboboxSelected>>', lambda event: self.refresh_timetable_keys())
+        self.timetable_keys.bind('<<ComboboxSelected>>', lambda event: self.render_timetable())
+        
+        # One row per slot of the time grid, one column per day
+        columns = ['time'] + list(self.grid.day_names)
+        self.timetable = ttk.Treeview(self.timetable_tab, columns=columns, show='headings', height=10)
+        for column in columns:
+            self.timetable.heading(column, text=column.capitalize())
+            self.timetable.column(column, width=60 if column == 'time' else 200, anchor='center')
+        self.timetable.pack(fill='both', expand=True, padx=5, pady=5)
+    
+    def timetable_groups(self):
+        views = {'Cohort': self.schedule.by_cohort, 'Teacher': self.schedule.by_teacher,
+                 'Room': self.schedule.by_room}
+        return views[self.timetable_view.get()]()
+    
+    def refresh_timetable_keys(self):
+        if self.schedule is None:
+            return
+        keys = [str(key) for key in sorted(self.timetable_groups())]
+        self.timetable_keys['values'] = keys
+        self.timetable_key.set(keys[0] if keys else '')
+        self.render_timetable()
+    
+    def render_timetable(self):
+        self.timetable.delete(*self.timetable.get_children())
+        if self.schedule is None:
+            return
+        groups = {str(key): entries for key, entries in self.timetable_groups().items()}
+        view = self.timetable_view.get()
+        grid = self.grid
+        slot = lambda label: (minutes(label) - grid.start) // grid.slot_minutes
+        cells = {}
+        for entry in groups.get(self.timetable_key.get(), []):
+            detail = entry.teacher if view == 'Room' else entry.room
+            for time_slot in range(slot(entry.start), slot(entry.end)):
+                cells.setdefault((time_slot, entry.day), []).append(f"{entry.course} ({detail})")
+        for time_slot in range(grid.slots):
+            row = [grid.label(time_slot)] + [' / '.join(cells.get((time_slot, day), []))
+                                             for day in range(grid.days)]
+            self.timetable.insert('', tk.END, values=row)
+    
+    def start_solve(self):
+        if self.job is not None:
+            return
+        backend = BACKENDS[self.backend_var.get()]()
+        self.job = SolveJob({'courses': self.courses_df, 'rooms': self.rooms_df,
+                             'teachers': self.teachers_df}, backend, self.grid)
+        self.solve_phase = 'starting'
+        self.solve_incumbent = None
+        self.solve_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+        self.solve_progress.start()
+        self.job.start()
+        self.root.after(100, self.poll_solve)
+    
+    def cancel_solve(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.solve_phase = 'cancelling'
+    
+    def poll_solve(self):
+        # Drain the worker's events on the Tk thread; reschedules itself
+        # until the job reports a final event
+        finished = None
+        while True:
+            try:
+                kind, value = self.job.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'phase':
+                self.solve_phase = value
+            elif kind == 'incumbent':
+                self.solve_incumbent = value
+            else:
+                finished = (kind, value)
+        
+        elapsed = self.job.elapsed()
+        if finished is None:
+            incumbent = '-' if self.solve_incumbent is None else f"{self.solve_incumbent:.0f}"
+            self.solve_status.set(f"{self.solve_phase} | incumbent: {incumbent} | {elapsed:.1f}s")
+            self.root.after(100, self.poll_solve)
+            return
+        
+        self.job = None
+        self.solve_progress.stop()
+        self.solve_button.config(state='normal')
+        self.cancel_button.config(state='disabled')
+        kind, value = finished
+        if kind == 'done':
+            self.schedule = value
+            self.solve_status.set(f"{value.status}: objective {value.objective:.0f} in {elapsed:.1f}s")
+            self.refresh_timetable_keys()
+            self.notebook.select(self.timetable_tab)
+        elif kind == 'cancelled':
+            self.solve_status.set(f"Cancelled after {elapsed:.1f}s")
+        elif kind == 'failed':
+            self.solve_status.set(f"No solution found ({value})")
+        else:
+            self.solve_status.set("Solve failed")
+            messagebox.showerror("Error", f"Error while solving: {value}")
 
-    def on_room_select(self, event):
-        if self.rooms_listbox.curselection():
-            idx = self.rooms_listbox.curselection()[0]
-            room = self.rooms_df.iloc[idx]
-            
-            for field, var in self.room_vars.items():
-                var.set(room[field])
+    def mark_dirty(self, table):
+        self.dirty.add(table)
+        self.root.title("Course Scheduler Data Editor *")
 
-    def on_teacher_select(self, event):
-        if self.teachers_listbox.curselection():
-            idx = self.teachers_listbox.curselection()[0]
-            teacher = self.teachers_df.iloc[idx]
-            
-            self.teacher_vars['name'].set(teacher['name'])
-            self.teacher_vars['title'].set(teacher['title'])
-            
-            # Set availability and preferences text
-            self.availability_text.delete('1.0', tk.END)
-            self.availability_text.insert('1.0', str(teacher['availability']))
-            
-            self.preferences_text.delete('1.0', tk.END)
-            self.preferences_text.insert('1.0', str(teacher['preferences']))
+    def on_course_select(self, idx):
+        self.current_course_index = idx  # Store the current index
+        course = self.courses_df.iloc[idx]
+        
+        # Update all variables with current values
+        self.course_vars['name'].set(str(course['name']))
+        self.course_vars['hours'].set(str(course['hours']))
+        self.course_vars['students'].set(str(course['students']))
+        self.course_vars['possible_teachers'].set(str(course['possible_teachers']))
+        self.course_vars['is_elective'].set(str(course['is_elective']))
+        self.course_vars['course_year'].set(str(course['course_year']))
+
+    def on_room_select(self, idx):
+        room = self.rooms_df.iloc[idx]
+        
+        for field, var in self.room_vars.items():
+            var.set(room[field] if field in room else '')
+
+    def on_teacher_select(self, idx):
+        teacher = self.teachers_df.iloc[idx]
+        
+        self.teacher_vars['name'].set(teacher['name'])
+        self.teacher_vars['title'].set(teacher['title'])
+        
+        # Set availability and preferences text
+        self.availability_text.delete('1.0', tk.END)
+        self.availability_text.insert('1.0', str(teacher['availability']))
+        
+        self.preferences_text.delete('1.0', tk.END)
+        self.preferences_text.insert('1.0', str(teacher['preferences']))
 
     def new_course(self):
         # Create a new empty row in the DataFrame
@@ -220,6 +514,7 @@ class DataEditor:
             'course_year': [0]
         })
         self.courses_df = pd.concat([self.courses_df, new_row], ignore_index=True)
+        self.mark_dirty('courses')
         
         # Clear all fields
         for var in self.course_vars.values():
@@ -228,11 +523,10 @@ class DataEditor:
             else:
                 var.set('')
                 
-        # Add empty item to listbox and select it
-        self.courses_listbox.insert(tk.END, '')
-        last_index = self.courses_listbox.size() - 1
-        self.courses_listbox.selection_clear(0, tk.END)
-        self.courses_listbox.selection_set(last_index)
+        # Add empty item to the list and select it
+        self.courses_list.set_items(self.courses_df['name'])
+        self.current_course_index = len(self.courses_df) - 1
+        self.courses_list.select(self.current_course_index)
 
 
     def update_course(self):
@@ -248,13 +542,13 @@ class DataEditor:
                     'course_year': int(self.course_vars['course_year'].get())
                 }
 
-                # Update DataFrame row
-                self.courses_df.iloc[self.current_course_index] = pd.Series(new_values)
+                # Update DataFrame row (other columns, e.g. department, are kept)
+                for field, value in new_values.items():
+                    self.courses_df.at[self.current_course_index, field] = value
+                self.mark_dirty('courses')
                 
-                # Update listbox
-                self.courses_listbox.delete(self.current_course_index)
-                self.courses_listbox.insert(self.current_course_index, new_values['name'])
-                self.courses_listbox.selection_set(self.current_course_index)
+                # Update list
+                self.courses_list.set_item(self.current_course_index, new_values['name'])
                 
                 messagebox.showinfo("Success", "Course updated successfully!")
                 
@@ -265,37 +559,40 @@ class DataEditor:
 
 
     def delete_course(self):
-        if self.courses_listbox.curselection():
-            idx = self.courses_listbox.curselection()[0]
+        idx = self.courses_list.selected
+        if idx is not None:
             self.courses_df.drop(idx, inplace=True)
             self.courses_df.reset_index(drop=True, inplace=True)
-            self.courses_listbox.delete(idx)
+            self.mark_dirty('courses')
+            self.current_course_index = None
+            self.courses_list.clear_selection()
+            self.courses_list.set_items(self.courses_df['name'])
 
     def new_room(self):
         # Clear all fields
         for var in self.room_vars.values():
             var.set('')
-        self.rooms_listbox.selection_clear(0, tk.END)
+        self.rooms_list.clear_selection()
 
     def update_room(self):
-        if self.rooms_listbox.curselection():
-            idx = self.rooms_listbox.curselection()[0]
-            
+        idx = self.rooms_list.selected
+        if idx is not None:
             # Update DataFrame
             for field, var in self.room_vars.items():
                 self.rooms_df.at[idx, field] = var.get()
+            self.mark_dirty('rooms')
             
-            # Update listbox
-            self.rooms_listbox.delete(idx)
-            self.rooms_listbox.insert(idx, self.room_vars['name'].get())
-            self.rooms_listbox.selection_set(idx)
+            # Update list
+            self.rooms_list.set_item(idx, self.room_vars['name'].get())
 
     def delete_room(self):
-        if self.rooms_listbox.curselection():
-            idx = self.rooms_listbox.curselection()[0]
+        idx = self.rooms_list.selected
+        if idx is not None:
             self.rooms_df.drop(idx, inplace=True)
             self.rooms_df.reset_index(drop=True, inplace=True)
-            self.rooms_listbox.delete(idx)
+            self.mark_dirty('rooms')
+            self.rooms_list.clear_selection()
+            self.rooms_list.set_items(self.rooms_df['name'])
 
     def new_teacher(self):
         # Clear all fields
@@ -303,46 +600,61 @@ class DataEditor:
             var.set('')
         self.availability_text.delete('1.0', tk.END)
         self.preferences_text.delete('1.0', tk.END)
-        self.teachers_listbox.selection_clear(0, tk.END)
+        self.teachers_list.clear_selection()
 
     def update_teacher(self):
-        if self.teachers_listbox.curselection():
-            idx = self.teachers_listbox.curselection()[0]
-            
+        idx = self.teachers_list.selected
+        if idx is not None:
             try:
                 # Validate JSON format
-                availability = ast.literal_eval(self.availability_text.get('1.0', tk.END).strip())
-                preferences = ast.literal_eval(self.preferences_text.get('1.0', tk.END).strip())
+                name = self.teacher_vars['name'].get()
+                availability = parse_matrix(self.availability_text.get('1.0', tk.END).strip(), name)
+                preferences = parse_matrix(self.preferences_text.get('1.0', tk.END).strip(), name)
                 
                 # Update DataFrame
-                self.teachers_df.at[idx, 'name'] = self.teacher_vars['name'].get()
+                self.teachers_df.at[idx, 'name'] = name
                 self.teachers_df.at[idx, 'title'] = self.teacher_vars['title'].get()
-                self.teachers_df.at[idx, 'availability'] = str(availability)
-                self.teachers_df.at[idx, 'preferences'] = str(preferences)
+                self.teachers_df.at[idx, 'availability'] = json.dumps(availability.tolist(), separators=(',', ':'))
+                self.teachers_df.at[idx, 'preferences'] = json.dumps(preferences.tolist(), separators=(',', ':'))
+                self.mark_dirty('teachers')
                 
-                # Update listbox
-                self.teachers_listbox.delete(idx)
-                self.teachers_listbox.insert(idx, self.teacher_vars['name'].get())
-                self.teachers_listbox.selection_set(idx)
+                # Update list
+                self.teachers_list.set_item(idx, name)
                 
-            except (SyntaxError, ValueError) as e:
+            except ValueError as e:
                 messagebox.showerror("Error", "Invalid format in availability or preferences")
 
     def delete_teacher(self):
-        if self.teachers_listbox.curselection():
-            idx = self.teachers_listbox.curselection()[0]
+        idx = self.teachers_list.selected
+        if idx is not None:
             self.teachers_df.drop(idx, inplace=True)
             self.teachers_df.reset_index(drop=True, inplace=True)
-            self.teachers_listbox.delete(idx)
+            self.mark_dirty('teachers')
+            self.teachers_list.clear_selection()
+            self.teachers_list.set_items(self.teachers_df['name'])
 
     def save_all_changes(self):
+        # Write only the tables edited since the last save
+        if not self.dirty:
+            messagebox.showinfo("Success", "No changes to save.")
+            return True
         try:
-            self.courses_df.to_csv('courses.csv', index=False)
-            self.rooms_df.to_csv('rooms.csv', index=False)
-            self.teachers_df.to_csv('teachers.csv', index=False)
+            for table in sorted(self.dirty):
+                self.source.write_table(table, getattr(self, f'{table}_df'))
+                self.dirty.discard(table)
+            self.root.title("Course Scheduler Data Editor")
             messagebox.showinfo("Success", "All changes saved successfully!")
+            return True
         except Exception as e:
             messagebox.showerror("Error", f"Error saving changes: {str(e)}")
+            return False
+
+    def on_close(self):
+        if self.dirty:
+            answer = messagebox.askyesnocancel("Unsaved changes", "Save changes before closing?")
+            if answer is None or (answer and not self.save_all_changes()):
+                return
+        self.root.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,274 @@
+import contextlib
+import copy
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from multiprocessing import Manager
+
+import numpy as np
+
+from cozucu import Backend, MipBackend, Solution
+
+
+class DisjointSet:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+
+def components(data):
+    # Connected components of the conflict graph: two courses are linked when
+    # they share an eligible teacher, a room both can use, or the same year as
+    # mandatory courses. Returns lists of course indices. With capacity-only
+    # room eligibility every course fits the largest room, so departments
+    # separate only when rooms carry a department (see veri.Dataset).
+    courses = len(data.course_names)
+    groups = DisjointSet(courses)
+
+    def link(members):
+        for course_idx in members[1:]:
+            groups.union(members[0], course_idx)
+
+    by_teacher = {}
+    by_room = {}
+    by_year = {}
+    for course_idx in range(courses):
+        for teacher_idx in data.course_teachers[course_idx]:
+            by_teacher.setdefault(teacher_idx, []).append(course_idx)
+        for room_idx in data.course_rooms[course_idx]:
+            by_room.setdefault(room_idx, []).append(course_idx)
+        if data.is_elective[course_idx] == 0:
+            by_year.setdefault(int(data.course_years[course_idx]), []).append(course_idx)
+    for members in (*by_teacher.values(), *by_room.values(), *by_year.values()):
+        link(members)
+
+    found = {}
+    for course_idx in range(courses):
+        found.setdefault(groups.find(course_idx), []).append(course_idx)
+    return list(found.values())
+
+
+def subproblem(scheduler, course_ids):
+    # Tables restricted to one component, with the global index of every row
+    data = scheduler.data
+    teacher_ids = sorted({t for c in course_ids for t in data.course_teachers[c]})
+    room_ids = sorted({r for c in course_ids for r in data.course_rooms[c]})
+    tables = {
+        'courses': scheduler.courses_df.iloc[course_ids].reset_index(drop=True),
+        'rooms': scheduler.rooms_df.iloc[room_ids].reset_index(drop=True),
+        'teachers': scheduler.teachers_df.iloc[teacher_ids].reset_index(drop=True),
+    }
+    return tables, (course_ids, teacher_ids, room_ids)
+
+
+def to_global(ids, key):
+    # Component (course, teacher, room, day, start) key -> global indices
+    course_ids, teacher_ids, room_ids = ids
+    return (course_ids[key[0]], teacher_ids[key[1]], room_ids[key[2]], int(key[3]), int(key[4]))
+
+
+def to_local(ids, keys):
+    # Global keys of one component's courses -> component indices; keys
+    # whose teacher or room is not in the component are dropped
+    index = [{idx: local for local, idx in enumerate(table_ids)} for table_ids in ids]
+    local = []
+    for course_idx, teacher_idx, room_idx, day, start in keys:
+        if course_idx in index[0] and teacher_idx in index[1] and room_idx in index[2]:
+            local.append((index[0][course_idx], index[1][teacher_idx], index[2][room_idx], day, start))
+    return local
+
+
+class ComponentLog:
+    # Incumbent log of a component's backend: sends each incumbent, keys
+    # mapped to global indices, to the parent over a queue
+    def __init__(self, incumbents, part, ids):
+        self.incumbents = incumbents
+        self.part = part
+        self.ids = ids
+
+    def record(self, objective, bound, assignments):
+        self.incumbents.put((self.part, objective, bound, [to_global(self.ids, key) for key in assignments]))
+
+
+class IncumbentMerger:
+    # Joins the best incumbent of every component into an incumbent of the
+    # whole instance, once every component has one, and passes it to the
+    # log and listener of the partitioned solve
+    def __init__(self, parts, log=None, listener=None):
+        self.parts = parts
+        self.log = log
+        self.listener = listener
+        self.best = {}  # part -> (objective, bound, assignments)
+
+    def add(self, part, objective, bound, assignments):
+        if part in self.best and objective <= self.best[part][0]:
+            return
+        self.best[part] = (objective, bound, assignments)
+        if len(self.best) < self.parts:
+            return
+        objective = sum(best[0] for best in self.best.values())
+        bound = sum(best[1] if best[1] is not None else best[0] for best in self.best.values())
+        if self.listener is not None:
+            self.listener(objective, bound)
+        if self.log is not None:
+            self.log.record(objective, bound, [key for best in self.best.values() for key in best[2]])
+
+    def drain(self, incumbents):
+        # Consume incumbents until None arrives
+        for item in iter(incumbents.get, None):
+            self.add(*item)
+
+
+def solve_component(scheduler_class, tables, grid, backend, hint=(), fixed=(), log=None, stop=None):
+    # Runs in a worker process. A watcher thread turns stop (an Event set
+    # by PartitionedBackend.cancel) into Backend.cancel().
+    finished = threading.Event()
+
+    def watch():
+        while not finished.wait(0.2):
+            if stop.is_set():
+                backend.cancel()
+                return
+
+    if stop is not None:
+        threading.Thread(target=watch, daemon=True).start()
+    try:
+        scheduler = scheduler_class(solution_path=None, tables=tables, grid=grid)
+        scheduler.hint, scheduler.fixed = list(hint), list(fixed)
+        backend.incumbent_log = log
+        solution = backend.solve(scheduler)
+    finally:
+        finished.set()
+    candidates = np.array(scheduler.candidates, dtype=np.int32).reshape(-1, 5)
+    return solution, scheduler.presolve_stats, candidates, scheduler.report.to_dict()
+
+
+class PartitionedBackend(Backend):
+    # Splits the instance into independent components and solves each with
+    # the inner backend in a process pool; wall time then follows the
+    # largest component instead of the whole faculty. The limits are the
+    # inner backend's, the hint and fixed keys of the scheduler are split
+    # over the components, and the incumbent log and listener see
+    # incumbents of the whole instance.
+    name = 'partitioned'
+
+    def __init__(self, backend=None, max_workers=None):
+        self.backend = backend or MipBackend()
+        super().__init__(time_limit=self.backend.time_limit, relative_gap=self.backend.relative_gap,
+                         incumbent_path=self.backend.incumbent_path)
+        self.on_incumbent = self.backend.on_incumbent
+        self.streams_incumbents = self.backend.streams_incumbents
+        self.max_workers = max_workers
+        # Set while solving: the Event the components watch and the pool's futures
+        self.stop = None
+        self.futures = []
+
+    def cancel(self):
+        # Stops the running components and drops the queued ones
+        self.cancelled = True
+        stop = self.stop
+        if stop is not None:
+            stop.set()
+        for future in self.futures:
+            future.cancel()
+
+    def solve(self, scheduler):
+        start = time.time()
+        report = scheduler.report
+        with report.phase('partition'):
+            parts = [subproblem(scheduler, course_ids) for course_ids in components(scheduler.data)]
+
+        # Components solve with a copy of the inner backend whose
+        # incumbents go to the merger instead
+        backend = copy.copy(self.backend)
+        backend.incumbent_path = None
+        backend.on_incumbent = None
+        listening = self.incumbent_path or self.on_incumbent is not None
+        if listening:
+            merger = IncumbentMerger(len(parts), self.open_log(), self.on_incumbent)
+        jobs = [(type(scheduler), tables, scheduler.grid, backend,
+                 to_local(ids, scheduler.hint), to_local(ids, scheduler.fixed))
+                for tables, ids in parts]
+        # Components cancelled before they ran
+        skipped = (Solution(self.backend.name, 'NOT_SOLVED'), {}, np.zeros((0, 5), dtype=np.int32),
+                   {'families': {}, 'solver': {}})
+
+        with report.phase('solve'), contextlib.ExitStack() as stack:
+            # Workers reach the merger and the stop Event through a manager
+            manager = stack.enter_context(Manager()) if len(parts) > 1 else None
+            if listening:
+                incumbents = queue.Queue() if manager is None else manager.Queue()
+                drainer = threading.Thread(target=merger.drain, args=(incumbents,), daemon=True)
+                drainer.start()
+            logs = [ComponentLog(incumbents, part, ids) if listening else None
+                    for part, (_, ids) in enumerate(parts)]
+            self.stop = threading.Event() if manager is None else manager.Event()
+            if self.cancelled:
+                self.stop.set()
+            try:
+                if manager is None:
+                    results = [solve_component(*jobs[0], logs[0], self.stop)]
+                else:
+                    with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                        self.futures = [pool.submit(solve_component, *job, log, self.stop)
+                                        for job, log in zip(jobs, logs)]
+                        if self.cancelled:
+                            self.cancel()
+                        results = []
+                        for future in self.futures:
+                            try:
+                                results.append(future.result())
+                            except CancelledError:
+                                results.append(skipped)
+            finally:
+                self.stop = None
+                self.futures = []
+            if listening:
+                incumbents.put(None)
+                drainer.join()
+
+        # Merge: map component keys back to global indices
+        scheduler.presolve_stats = {}
+        scheduler.candidates = []
+        assignments = []
+        statuses = []
+        objective = bound = 0.0
+        report.solver = {'backend': f'{self.name}/{self.backend.name}', 'components': []}
+        for (_, ids), (solution, stats, candidates, part_report) in zip(parts, results):
+            for rule, count in stats.items():
+                scheduler.presolve_stats[rule] = scheduler.presolve_stats.get(rule, 0) + count
+            scheduler.candidates.extend(to_global(ids, key) for key in candidates.tolist())
+            assignments.extend(to_global(ids, key) for key in solution.assignments)
+            statuses.append(solution.status)
+            if solution.found:
+                objective += solution.objective
+                bound += solution.bound if solution.bound is not None else solution.objective
+            for family, counts in part_report['families'].items():
+                report.count(family, **counts)
+            report.solver['components'].append({'courses': len(ids[0]), **part_report['solver']})
+
+        if all(status == 'OPTIMAL' for status in statuses):
+            status = 'OPTIMAL'
+        elif 'INFEASIBLE' in statuses:
+            status = 'INFEASIBLE'
+        elif all(status in ('OPTIMAL', 'FEASIBLE') for status in statuses):
+            status = 'FEASIBLE'
+        else:
+            status = 'NOT_SOLVED'
+        report.solver['status'] = status
+
+        solution = Solution(self.name, status, wall_time=time.time() - start)
+        if solution.found:
+            solution.objective = objective
+            solution.bound = bound
+            solution.assignments = assignments
+        return solution
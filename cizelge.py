@@ -0,0 +1,176 @@
+import csv
+import datetime
+import json
+import os
+from collections import namedtuple
+
+from zaman import minutes
+
+# One scheduled course; day is 0-based (0 = the first day of the time grid),
+# start and end are 'HH:MM' clock times
+Entry = namedtuple('Entry', 'course teacher room day start end year elective score')
+
+
+class Schedule:
+    # The chosen assignments of a solve, resolved to names once. Built in a
+    # single pass over the selected keys, so its cost follows the number of
+    # courses rather than the number of model variables.
+    def __init__(self, scheduler, solution):
+        self.status = solution.status
+        self.objective = solution.objective
+        self.bound = solution.bound
+        self.backend = solution.backend
+        self.wall_time = solution.wall_time
+        self.day_names = scheduler.grid.day_names
+
+        data = scheduler.data
+        grid = scheduler.grid
+        keys = sorted(solution.assignments)
+        scores = scheduler.preference_scores(keys).tolist() if keys else []
+        self.entries = []
+        for (course_idx, teacher_idx, room_idx, day, start), score in zip(keys, scores):
+            self.entries.append(Entry(
+                course=data.course_names[course_idx],
+                teacher=data.teacher_names[teacher_idx],
+                room=data.room_names[room_idx],
+                day=int(day),
+                start=grid.label(start),
+                end=grid.label(start + scheduler.course_slots[course_idx]),
+                year=int(data.course_years[course_idx]),
+                elective=bool(data.is_elective[course_idx]),
+                score=int(score),
+            ))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def view(self, field):
+        # Entries grouped by one field, each group in weekly order
+        groups = {}
+        for entry in sorted(self.entries, key=lambda e: (e.day, e.start, e.course)):
+            groups.setdefault(getattr(entry, field), []).append(entry)
+        return groups
+
+    def by_teacher(self):
+        return self.view('teacher')
+
+    def by_room(self):
+        return self.view('room')
+
+    def by_cohort(self):
+        # Keyed by course year; electives of the year are included
+        return self.view('year')
+
+    def text(self):
+        # The console listing proje.py has always printed
+        lines = []
+        for entry in self.entries:
+            lines += [
+                f"Course: {entry.course}",
+                f"Teacher: {entry.teacher}",
+                f"Room: {entry.room}",
+                f"Day: {entry.day + 1}",
+                f"Time: {short_clock(entry.start)} - {short_clock(entry.end)}",
+                f"Preference Score: {entry.score}",
+                "-------------------",
+            ]
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'objective': self.objective,
+            'bound': self.bound,
+            'backend': self.backend,
+            'wall_time': self.wall_time,
+            # Days counted from 1 as in the console and CSV output
+            'assignments': [dict(entry._asdict(), day=entry.day + 1, day_name=self.day_names[entry.day])
+                            for entry in self.entries],
+        }
+
+    def to_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def to_csv(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(('course', 'teacher', 'room', 'day', 'day_name', 'start', 'end',
+                             'year', 'elective', 'score'))
+            for entry in self.entries:
+                writer.writerow((entry.course, entry.teacher, entry.room, entry.day + 1,
+                                 self.day_names[entry.day], entry.start, entry.end,
+                                 entry.year, int(entry.elective), entry.score))
+
+    def to_ics(self, path, week_start=None, weeks=None):
+        # iCalendar file with one weekly recurring event per course, starting
+        # in the week of week_start (a date, default: next Monday). Times are
+        # floating local times. With weeks, the series stops after that many
+        # weeks.
+        if week_start is None:
+            today = datetime.date.today()
+            week_start = today + datetime.timedelta(days=7 - today.weekday())
+        monday = week_start - datetime.timedelta(days=week_start.weekday())
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+        lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//proje//Course Scheduler//EN',
+                 'CALSCALE:GREGORIAN']
+        for idx, entry in enumerate(self.entries):
+            date = monday + datetime.timedelta(days=entry.day)
+            rule = 'FREQ=WEEKLY' + (f';COUNT={weeks}' if weeks else '')
+            lines += [
+                'BEGIN:VEVENT',
+                f'UID:{monday:%Y%m%d}-{idx}@proje',
+                f'DTSTAMP:{stamp}',
+                f'DTSTART:{date:%Y%m%d}T{entry.start.replace(":", "")}00',
+                f'DTEND:{date:%Y%m%d}T{entry.end.replace(":", "")}00',
+                f'RRULE:{rule}',
+                f'SUMMARY:{ics_text(entry.course)}',
+                f'LOCATION:{ics_text(entry.room)}',
+                f'DESCRIPTION:{ics_text(entry.teacher)}',
+                'END:VEVENT',
+            ]
+        lines.append('END:VCALENDAR')
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            f.write(''.join(fold(line) + '\r\n' for line in lines))
+
+    def export(self, path, **options):
+        # Pick the exporter from the file extension
+        exporters = {'.csv': self.to_csv, '.json': self.to_json, '.ics': self.to_ics}
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in exporters:
+            raise ValueError(f"Unsupported export format {path!r}: use .csv, .json or .ics")
+        if extension == '.ics':
+            exporters[extension](path, **options)
+        else:
+            exporters[extension](path)
+
+
+def short_clock(label):
+    # '09:00' -> '9:00', as the console listing has always shown times
+    value = minutes(label)
+    return f'{value // 60}:{value % 60:02d}'
+
+
+def ics_text(value):
+    # Escape a TEXT value (RFC 5545, 3.3.11)
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\n', '\\n'))
+
+
+def fold(line, limit=75):
+    # Fold a content line at 75 octets without splitting a UTF-8 character
+    encoded = line.encode('utf-8')
+    if len(encoded) <= limit:
+        return line
+    parts = []
+    while encoded:
+        cut = min(limit if not parts else limit - 1, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    return '\r\n '.join(parts)
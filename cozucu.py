@@ -0,0 +1,572 @@
+import json
+import time
+
+import numpy as np
+from ortools.linear_solver import linear_solver_pb2, pywraplp
+from ortools.sat.python import cp_model
+
+
+MIP_STATUS = {
+    pywraplp.Solver.OPTIMAL: 'OPTIMAL',
+    pywraplp.Solver.FEASIBLE: 'FEASIBLE',
+    pywraplp.Solver.INFEASIBLE: 'INFEASIBLE',
+    pywraplp.Solver.UNBOUNDED: 'UNBOUNDED',
+    pywraplp.Solver.ABNORMAL: 'ABNORMAL',
+    pywraplp.Solver.NOT_SOLVED: 'NOT_SOLVED',
+}
+
+
+def milliseconds(seconds):
+    # pywraplp time limit; SetTimeLimit(0) means no limit, so never pass 0
+    return max(1, int(seconds * 1000))
+
+
+class Solution:
+    # Backend independent result of a solve, so backends can be compared
+    # on the same terms
+    def __init__(self, backend, status, objective=None, assignments=None, wall_time=0.0, bound=None):
+        self.backend = backend
+        self.status = status            # 'OPTIMAL', 'FEASIBLE', 'INFEASIBLE', ...
+        self.objective = objective
+        self.bound = bound              # best proven bound on the objective
+        self.assignments = assignments or []  # chosen (course, teacher, room, day, start) keys
+        self.wall_time = wall_time      # seconds spent building and solving
+
+    @property
+    def found(self):
+        return self.status in ('OPTIMAL', 'FEASIBLE')
+
+    @property
+    def gap(self):
+        # Relative gap between the objective and the bound
+        if self.objective is None or self.bound is None:
+            return None
+        return abs(self.bound - self.objective) / max(abs(self.objective), 1.0)
+
+    def __repr__(self):
+        return (f"Solution(backend={self.backend!r}, status={self.status!r}, "
+                f"objective={self.objective}, gap={self.gap}, assignments={len(self.assignments)}, "
+                f"wall_time={self.wall_time:.2f})")
+
+
+class IncumbentLog:
+    # Appends one JSON line per improving incumbent (timestamp, elapsed time,
+    # objective, bound and the assignments), so a run stopped early still
+    # leaves its best schedule on disk
+    def __init__(self, path):
+        self.path = path
+        self.start = time.time()
+        self.best = None
+        open(path, 'w').close()
+
+    def record(self, objective, bound, assignments):
+        if self.best is not None and objective <= self.best:
+            return
+        self.best = objective
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'elapsed': round(time.time() - self.start, 3),
+            'objective': objective,
+            'bound': bound,
+            'assignments': [[int(v) for v in key] for key in assignments],
+        }
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+
+class IncumbentCallback(cp_model.CpSolverSolutionCallback):
+    # assign turns the chosen keys into the logged assignments (e.g. room
+    # classes into concrete rooms)
+    def __init__(self, presence, log=None, listener=None, assign=None):
+        super().__init__()
+        self.presence = presence
+        self.log = log
+        self.listener = listener
+        self.assign = assign
+
+    def on_solution_callback(self):
+        if self.listener is not None:
+            self.listener(self.ObjectiveValue(), self.BestObjectiveBound())
+        if self.log is not None:
+            chosen = [key for key, literal in self.presence.items() if self.BooleanValue(literal)]
+            if self.assign is not None:
+                chosen = self.assign(chosen)
+            self.log.record(self.ObjectiveValue(), self.BestObjectiveBound(), chosen)
+
+
+class Backend:
+    # Limits shared by every backend: wall-clock time limit in seconds,
+    # relative gap at which to stop, and a file to stream incumbents to.
+    # streams_incumbents tells whether every improving incumbent reaches
+    # that file during the solve; pywraplp backends only log their final
+    # one (see log_final).
+    streams_incumbents = False
+
+    def __init__(self, time_limit=None, relative_gap=None, incumbent_path=None):
+        self.time_limit = time_limit
+        self.relative_gap = relative_gap
+        self.incumbent_path = incumbent_path
+        # Called with (objective, bound) for every incumbent that reaches
+        # the backend, e.g. to show progress in the editor
+        self.on_incumbent = None
+        # Object with IncumbentLog.record taking the incumbents instead of
+        # incumbent_path (see bolme.ComponentLog)
+        self.incumbent_log = None
+        # Solver currently running, so that cancel() can stop it
+        self.running = None
+        self.cancelled = False
+
+    def cancel(self):
+        # Stop the solve from another thread; it returns with the best
+        # solution found so far, if any
+        self.cancelled = True
+        solver = self.running
+        if isinstance(solver, cp_model.CpSolver):
+            solver.StopSearch()
+        elif solver is not None:
+            solver.InterruptSolve()
+
+    def run(self, solver, *args):
+        # solver.Solve(*args), interruptible through cancel()
+        self.running = solver
+        try:
+            if self.cancelled:
+                return None
+            return solver.Solve(*args)
+        finally:
+            self.running = None
+
+    def solve_mip(self, solver, report=None, time_limit=None):
+        # Solve a pywraplp model under the configured limits (time_limit
+        # overrides the backend's); returns the status name and the best
+        # bound. pywraplp has no incumbent callback, so only the final
+        # incumbent reaches the log.
+        time_limit = self.time_limit if time_limit is None else time_limit
+        if time_limit is not None:
+            solver.SetTimeLimit(milliseconds(time_limit))
+        parameters = pywraplp.MPSolverParameters()
+        if self.relative_gap is not None:
+            parameters.SetDoubleParam(parameters.RELATIVE_MIP_GAP, self.relative_gap)
+        result = self.run(solver, parameters)
+        status = 'NOT_SOLVED' if result is None else MIP_STATUS.get(result, 'UNKNOWN')
+        bound = solver.Objective().BestBound() if status in ('OPTIMAL', 'FEASIBLE') else None
+        if report is not None:
+            # A solve cancelled before it started has no statistics
+            solved = result is not None
+            report.solver.update({
+                'backend': self.name,
+                'status': status,
+                'nodes': solver.nodes() if solved else 0,
+                'iterations': solver.iterations() if solved else 0,
+                'wall_time': solver.wall_time() / 1000,
+            })
+        return status, bound
+
+    def open_log(self):
+        if self.incumbent_log is not None:
+            return self.incumbent_log
+        return IncumbentLog(self.incumbent_path) if self.incumbent_path else None
+
+    def log_final(self, solution):
+        # pywraplp backends only see their final incumbent
+        if self.on_incumbent is not None and solution.found:
+            self.on_incumbent(solution.objective, solution.bound)
+        log = self.open_log() if solution.found else None
+        if log is not None:
+            log.record(solution.objective, solution.bound, solution.assignments)
+
+
+def column_values(solver):
+    # Values of every column of a solved pywraplp model, in column order,
+    # in one call instead of one solution_value() per variable
+    response = linear_solver_pb2.MPSolutionResponse()
+    solver.FillSolutionResponseProto(response)
+    return np.asarray(response.variable_value)
+
+
+def warm_start(solver, variables, hint, fixed):
+    # Pass a previous assignment to a pywraplp solver as a (partial) hint
+    # and fix the given keys to 1; keys without a variable are ignored
+    hinted = [variables[key] for key in hint if key in variables]
+    if hinted:
+        solver.SetHint(hinted, [1.0] * len(hinted))
+    for key in fixed:
+        if key in variables:
+            variables[key].SetLb(1)
+
+
+class MipBackend(Backend):
+    # The original pywraplp model solved by SCIP (or another MIP solver id)
+    name = 'scip'
+
+    def __init__(self, solver_id='SCIP', cache=None, **limits):
+        super().__init__(**limits)
+        self.solver_id = solver_id
+        self.cache = cache  # optional onbellek.ModelCache
+
+    def solve(self, scheduler):
+        start = time.time()
+        solver = scheduler.create_model(self.solver_id, self.cache)
+        warm_start(solver, scheduler.x, scheduler.class_keys(scheduler.hint),
+                   scheduler.class_keys(scheduler.fixed))
+        with scheduler.report.phase('solve'):
+            status, bound = self.solve_mip(solver, scheduler.report)
+
+        solution = Solution(self.name, status, wall_time=time.time() - start, bound=bound)
+        if solution.found:
+            solution.objective = solver.Objective().Value()
+            # scheduler.x holds the columns in creation order
+            keys = list(scheduler.x)
+            chosen = [keys[column] for column in np.flatnonzero(column_values(solver) > 0.5)]
+            with scheduler.report.phase('assign_rooms'):
+                solution.assignments = scheduler.assign_rooms(chosen)
+        self.log_final(solution)
+        return solution
+
+
+class CpSatBackend(Backend):
+    # CP-SAT model over the same presolved candidates: every candidate is an
+    # optional fixed-size interval on a week-long time line, and teacher,
+    # room and cohort clashes are NoOverlap constraints
+    name = 'cpsat'
+    streams_incumbents = True
+
+    CP_STATUS = {
+        cp_model.OPTIMAL: 'OPTIMAL',
+        cp_model.FEASIBLE: 'FEASIBLE',
+        cp_model.INFEASIBLE: 'INFEASIBLE',
+        cp_model.MODEL_INVALID: 'ABNORMAL',
+        cp_model.UNKNOWN: 'NOT_SOLVED',
+    }
+
+    def __init__(self, num_search_workers=8, **limits):
+        super().__init__(**limits)
+        self.num_search_workers = num_search_workers
+
+    def create_model(self, scheduler):
+        model = cp_model.CpModel()
+        report = scheduler.report
+        with report.phase('presolve'):
+            candidates = scheduler.presolve()
+
+        self.presence = {}
+        course_literals = {}
+        teacher_intervals = {}
+        room_intervals = {}
+        year_intervals = {}
+        for key in candidates:
+            course_idx, teacher_idx, room_idx, day, start = key
+            literal = model.NewBoolVar(f'x_{course_idx}_{teacher_idx}_{room_idx}_{day}_{start}')
+            # Slots of the week laid end to end; courses never cross a day
+            interval = model.NewOptionalFixedSizeIntervalVar(
+                day * scheduler.grid.slots + start, scheduler.course_slots[course_idx],
+                literal, f'i_{course_idx}_{teacher_idx}_{room_idx}_{day}_{start}')
+            self.presence[key] = literal
+
+            course_literals.setdefault(course_idx, []).append(literal)
+            teacher_intervals.setdefault(teacher_idx, []).append(interval)
+            room_intervals.setdefault(room_idx, []).append(interval)
+            if scheduler.is_elective[course_idx] == 0:
+                year_intervals.setdefault(scheduler.course_years[course_idx], []).append(interval)
+
+        report.count('variables', variables=len(candidates))
+
+        # Each course must be assigned exactly once
+        with report.phase('add_course_assignment_constraints'):
+            for course_idx in range(len(scheduler.course_hours)):
+                model.AddExactlyOne(course_literals.get(course_idx, []))
+        report.count('add_course_assignment_constraints', constraints=len(scheduler.course_hours))
+        # Teachers and the mandatory courses of a year can't overlap; a class
+        # of interchangeable rooms runs at most as many courses as it has rooms
+        for family, groups in (('add_teacher_constraints', teacher_intervals),
+                               ('add_room_constraints', room_intervals),
+                               ('add_mandatory_course_constraints', year_intervals)):
+            with report.phase(family):
+                for group, intervals in groups.items():
+                    rooms = len(scheduler.data.class_rooms[group]) if family == 'add_room_constraints' else 1
+                    if rooms == 1:
+                        model.AddNoOverlap(intervals)
+                    else:
+                        model.AddCumulative(intervals, [1] * len(intervals), rooms)
+            report.count(family, constraints=len(groups))
+
+        with report.phase('set_objective_function'):
+            scores = scheduler.preference_scores(candidates).tolist()
+            model.Maximize(sum(score * self.presence[key] for key, score in zip(candidates, scores)))
+
+        for key in scheduler.class_keys(scheduler.hint):
+            if key in self.presence:
+                model.AddHint(self.presence[key], 1)
+        for key in scheduler.class_keys(scheduler.fixed):
+            if key in self.presence:
+                model.Add(self.presence[key] == 1)
+        return model
+
+    def solve(self, scheduler):
+        start = time.time()
+        model = self.create_model(scheduler)
+        solver = cp_model.CpSolver()
+        solver.parameters.num_search_workers = self.num_search_workers
+        if self.time_limit is not None:
+            solver.parameters.max_time_in_seconds = self.time_limit
+        if self.relative_gap is not None:
+            solver.parameters.relative_gap_limit = self.relative_gap
+        callback = None
+        log = self.open_log()
+        if log is not None or self.on_incumbent is not None:
+            callback = IncumbentCallback(self.presence, log, self.on_incumbent, scheduler.assign_rooms)
+        with scheduler.report.phase('solve'):
+            result = self.run(solver, model, callback)
+        status = 'NOT_SOLVED' if result is None else self.CP_STATUS.get(result, 'UNKNOWN')
+        scheduler.report.solver.update({
+            'backend': self.name,
+            'status': status,
+            'branches': solver.NumBranches(),
+            'conflicts': solver.NumConflicts(),
+            'wall_time': solver.WallTime(),
+        })
+
+        solution = Solution(self.name, status, wall_time=time.time() - start)
+        if solution.found:
+            solution.objective = solver.ObjectiveValue()
+            solution.bound = solver.BestObjectiveBound()
+            chosen = [key for key, literal in self.presence.items() if solver.BooleanValue(literal)]
+            with scheduler.report.phase('assign_rooms'):
+                solution.assignments = scheduler.assign_rooms(chosen)
+        return solution
+
+
+def match_rooms(courses, rooms, eligible):
+    # Maximum bipartite matching of courses to rooms (Kuhn's augmenting
+    # paths). eligible(course, room) tells whether the room can host the
+    # course; rooms are tried in the given order, so passing them smallest
+    # first keeps large rooms free. Returns {course: room}.
+    owner = {}
+
+    def augment(course, seen):
+        for room in rooms:
+            if room in seen or not eligible(course, room):
+                continue
+            seen.add(room)
+            if room not in owner or augment(owner[room], seen):
+                owner[room] = course
+                return True
+        return False
+
+    for course in courses:
+        augment(course, set())
+    return {course: room for room, course in owner.items()}
+
+
+def match_day(scheduler, keys):
+    # Exact room assignment of one day's (course, teacher, day, start) keys:
+    # every course takes one eligible room and the courses of a room don't
+    # overlap. Returns ({key: room}, None), or (None, core) where core is a
+    # subset of keys that no assignment can house together.
+    model = cp_model.CpModel()
+    placed = {}
+    rooms = {}
+    intervals = {}  # room -> intervals of the courses it may host
+    for key in keys:
+        course_idx, _, _, start = key
+        placed[key] = model.NewBoolVar('')
+        rooms[key] = []
+        for room in scheduler.data.course_rooms[course_idx]:
+            literal = model.NewBoolVar('')
+            intervals.setdefault(room, []).append(model.NewOptionalFixedSizeIntervalVar(
+                start, scheduler.course_slots[course_idx], literal, ''))
+            rooms[key].append((room, literal))
+        model.AddAtMostOne(literal for _, literal in rooms[key])
+        model.AddBoolOr([literal for _, literal in rooms[key]]).OnlyEnforceIf(placed[key])
+    for room_intervals in intervals.values():
+        model.AddNoOverlap(room_intervals)
+    # Placing every course is assumed, so an infeasible day yields the
+    # assumptions responsible for it
+    model.AddAssumptions(list(placed.values()))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.num_search_workers = 1
+    if solver.Solve(model) in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return {key: next(room for room, literal in rooms[key] if solver.BooleanValue(literal))
+                for key in keys}, None
+    core = set(solver.SufficientAssumptionsForInfeasibility())
+    return None, [key for key in keys if placed[key].Index() in core] or list(keys)
+
+
+class TwoPhaseBackend(Backend):
+    # Decomposed solve. Phase one picks (teacher, day, start) for every
+    # course with room capacity as per-slot counting constraints; phase two
+    # assigns concrete rooms, so the MIP no longer carries a copy of every
+    # variable per room. The per-slot counts don't guarantee a room
+    # assignment over a whole day; when a day has none, a cut forbidding
+    # the courses that can't be housed together at those times is added
+    # and phase one is solved again.
+    name = 'two-phase'
+
+    def __init__(self, solver_id='SCIP', **limits):
+        super().__init__(**limits)
+        self.solver_id = solver_id
+
+    def create_model(self, scheduler):
+        solver = pywraplp.Solver.CreateSolver(self.solver_id)
+
+        report = scheduler.report
+        with report.phase('presolve'):
+            candidates = scheduler.presolve()
+
+        # Collapse the presolved candidates over rooms
+        self.y = {}
+        for course_idx, teacher_idx, room_idx, day, start in candidates:
+            key = (course_idx, teacher_idx, day, start)
+            if key not in self.y:
+                self.y[key] = solver.IntVar(0, 1, f'y_{course_idx}_{teacher_idx}_{day}_{start}')
+
+        course_index = {}
+        teacher_index = {}
+        year_index = {}
+        slot_index = {}  # (day, slot) -> [(rooms the course fits, var)] occupying that slot
+        for key, var in self.y.items():
+            course_idx, teacher_idx, day, start = key
+            course_index.setdefault(course_idx, []).append(var)
+            for slot in range(start, start + scheduler.course_slots[course_idx]):
+                teacher_index.setdefault((teacher_idx, day, slot), []).append(var)
+                slot_index.setdefault((day, slot), []).append((scheduler.data.course_rooms[course_idx], var))
+                if scheduler.is_elective[course_idx] == 0:
+                    year_index.setdefault((scheduler.course_years[course_idx], day, slot), []).append(var)
+
+        report.count('variables', variables=solver.NumVariables())
+
+        # Each course must be assigned exactly once
+        with report.family('add_course_assignment_constraints', solver):
+            for course_idx in range(len(scheduler.course_hours)):
+                solver.Add(sum(course_index.get(course_idx, [])) == 1)
+        # Teachers and the mandatory courses of a year can't overlap
+        for name, index in (('add_teacher_constraints', teacher_index),
+                            ('add_mandatory_course_constraints', year_index)):
+            with report.family(name, solver):
+                for time_vars in index.values():
+                    if len(time_vars) > 1:
+                        solver.Add(sum(time_vars) <= 1)
+        # Room capacity: in every slot, the courses that only fit in a room
+        # set S can't outnumber S, for every eligible set S. With
+        # capacity-only eligibility the sets are nested (every room of at
+        # least s seats), so these rows are exactly Hall's condition per
+        # slot. Department rooms break the nesting: Hall's condition also
+        # needs unions of eligible sets, which are added by add_cut only
+        # when a room assignment fails, as there may be exponentially many.
+        self.slot_index = slot_index
+        self.room_sets = set()
+        with report.family('add_room_constraints', solver):
+            for rooms in {rooms for occupying in slot_index.values() for rooms, _ in occupying}:
+                self.add_room_rows(solver, rooms)
+
+        with report.phase('set_objective_function'):
+            objective = solver.Objective()
+            keys = [(c, t, 0, d, s) for c, t, d, s in self.y]
+            for var, score in zip(self.y.values(), scheduler.preference_scores(keys).tolist()):
+                objective.SetCoefficient(var, score)
+            objective.SetMaximization()
+        return solver
+
+    def match_greedy(self, scheduler, keys):
+        # One day's keys by start slot: the courses starting in a slot are
+        # matched to the rooms whose occupied slots miss their footprint,
+        # largest course first and smallest adequate room first. Quick, but
+        # it never revisits an earlier slot, so it may miss an assignment.
+        rooms = sorted(range(len(scheduler.room_capacities)), key=lambda r: scheduler.room_capacities[r])
+        fits = lambda course, room: room in scheduler.data.course_rooms[course[0]]
+
+        busy = {}  # room -> bitmask of occupied slots
+        chosen = {}
+        for start in sorted({key[3] for key in keys}):
+            starting = sorted((key for key in keys if key[3] == start),
+                              key=lambda key: -scheduler.course_students[key[0]])
+            slot = 1 << start
+            free = [room for room in rooms if not busy.get(room, 0) & slot]
+            matched = match_rooms(starting, free, fits)
+            if len(matched) < len(starting):
+                return None
+            for key, room in matched.items():
+                busy[room] = busy.get(room, 0) | scheduler.grid.footprint(start, scheduler.course_slots[key[0]])
+            chosen.update(matched)
+        return chosen
+
+    def assign_rooms(self, scheduler, timed):
+        # Give every (course, teacher, day, start) a room, day by day: the
+        # greedy matching first, the exact one when it fails. Returns
+        # (assignments, None), or (None, core) for the first day without
+        # an assignment.
+        assignments = []
+        for day in sorted({key[2] for key in timed}):
+            keys = [key for key in timed if key[2] == day]
+            chosen = self.match_greedy(scheduler, keys)
+            if chosen is None:
+                chosen, core = match_day(scheduler, keys)
+                if chosen is None:
+                    return None, core
+            assignments.extend((c, t, room, d, s) for (c, t, d, s), room in chosen.items())
+        return assignments, None
+
+    def add_room_rows(self, solver, rooms):
+        # In every slot, at most len(rooms) of the courses fitting only in
+        # rooms can run
+        allowed = frozenset(rooms)
+        self.room_sets.add(allowed)
+        for occupying in self.slot_index.values():
+            time_vars = [var for fits, var in occupying if allowed.issuperset(fits)]
+            if len(time_vars) > len(allowed):
+                solver.Add(sum(time_vars) <= len(allowed))
+
+    def add_cut(self, scheduler, solver, core):
+        # The courses of core can't all keep these times
+        solver.Add(sum(self.y[key] for key in core) <= len(core) - 1)
+        # If they all meet in one slot, they fail Hall's condition there,
+        # typically on the union of their eligible sets; its rows hold in
+        # every slot and cut off the other timings with the same clash
+        common = scheduler.grid.full_mask
+        for course_idx, _, _, start in core:
+            common &= scheduler.grid.footprint(start, scheduler.course_slots[course_idx])
+        union = frozenset(room for key in core for room in scheduler.data.course_rooms[key[0]])
+        if common and union not in self.room_sets:
+            self.add_room_rows(solver, union)
+
+    def solve(self, scheduler):
+        start = time.time()
+        solver = self.create_model(scheduler)
+        collapse = lambda keys: [(c, t, d, s) for c, t, r, d, s in keys]
+        warm_start(solver, self.y, collapse(scheduler.hint), collapse(scheduler.fixed))
+        deadline = None if self.time_limit is None else start + self.time_limit
+        cuts = 0
+        solution = None
+        while True:
+            time_limit = None if deadline is None else deadline - time.time()
+            if solution is not None and (self.cancelled or time_limit is not None and time_limit <= 0):
+                # Out of time with no room assignment for the last timing
+                solution.status = 'NOT_SOLVED'
+                break
+            with scheduler.report.phase('solve'):
+                status, bound = self.solve_mip(solver, scheduler.report, time_limit)
+            solution = Solution(self.name, status, bound=bound)
+            if not solution.found:
+                break
+            keys = list(self.y)
+            timed = [keys[column] for column in np.flatnonzero(column_values(solver) > 0.5)]
+            with scheduler.report.phase('assign_rooms'):
+                assignments, core = self.assign_rooms(scheduler, timed)
+            if assignments is not None:
+                solution.objective = solver.Objective().Value()
+                solution.assignments = assignments
+                break
+            self.add_cut(scheduler, solver, core)
+            cuts += 1
+        scheduler.report.solver['room_cuts'] = cuts
+        solution.wall_time = time.time() - start
+        self.log_final(solution)
+        return solution
+
+
+BACKENDS = {
+    MipBackend.name: MipBackend,
+    CpSatBackend.name: CpSatBackend,
+    TwoPhaseBackend.name: TwoPhaseBackend,
+}
@@ -0,0 +1,99 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from cozucu import MipBackend
+from proje import CourseScheduler
+from uretec import generate, write_instance
+
+# The RunReport phases that build the pywraplp model, in CourseScheduler.create_model order
+BUILD_STEPS = ('presolve', 'create_variables', 'add_course_assignment_constraints',
+               'add_teacher_constraints', 'add_room_constraints', 'add_elective_constraints',
+               'add_mandatory_course_constraints', 'set_objective_function')
+
+def run_case(case, seed, time_limit):
+    # Generate one instance, build and solve it; runs in a fresh process so
+    # that peak RSS belongs to this case alone
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_instance(data_dir, *generate(seed=seed, **case))
+
+        scheduler = CourseScheduler(solution_path=os.path.join(data_dir, 'solution.json'), data_dir=data_dir)
+        solution = MipBackend(time_limit=time_limit).solve(scheduler)
+
+        report = scheduler.report
+        build_steps = {name: report.phases[name] for name in BUILD_STEPS if name in report.phases}
+        return {
+            **case,
+            'seed': seed,
+            'load_time': report.phases['load'] + report.phases['preprocess'],
+            'build_time': sum(build_steps.values()),
+            'build_steps': build_steps,
+            'families': report.families,
+            'variables': report.variables,
+            'constraints': report.constraints,
+            'status': solution.status,
+            'objective': solution.objective,
+            'bound': solution.bound,
+            'solve_time': report.phases['solve'],
+            'assign_rooms_time': report.phases.get('assign_rooms', 0.0),
+            'solver': report.solver,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+
+def sweep(sizes, teacher_ratio=1.0, room_ratio=0.34, courses_per_year=8, elective_ratio=0.3,
+          availability_density=0.8, seed=0, time_limit=60):
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for courses in sizes:
+        case = {
+            'courses': courses,
+            'teachers': max(1, round(courses * teacher_ratio)),
+            'rooms': max(1, round(courses * room_ratio)),
+            # Cohorts keep a realistic weekly load as the instance grows
+            'years': max(1, -(-courses // courses_per_year)),
+            'elective_ratio': elective_ratio,
+            'availability_density': availability_density,
+        }
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_case, case, seed, time_limit).result()
+        print(f"{courses:>6} courses: build {result['build_time']:8.2f}s  "
+              f"solve {result['solve_time']:8.2f}s  vars {result['variables']:>8}  "
+              f"rows {result['constraints']:>8}  rss {result['peak_rss_kb'] // 1024:>6} MB  "
+              f"{result['status']}")
+        results.append(result)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark for CourseScheduler")
+    parser.add_argument('--sizes', default='30,60,120',
+                        help="comma separated course counts (default: %(default)s)")
+    parser.add_argument('--teacher-ratio', type=float, default=1.0,
+                        help="teachers per course (default: %(default)s)")
+    parser.add_argument('--room-ratio', type=float, default=0.34,
+                        help="rooms per course (default: %(default)s)")
+    parser.add_argument('--courses-per-year', type=int, default=8,
+                        help="courses per cohort year (default: %(default)s)")
+    parser.add_argument('--elective-ratio', type=float, default=0.3)
+    parser.add_argument('--density', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--time-limit', type=float, default=60,
+                        help="solver time limit per case in seconds (default: %(default)s)")
+    parser.add_argument('--output', default='benchmark.json',
+                        help="JSON file for the results (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = sweep(sizes, args.teacher_ratio, args.room_ratio, args.courses_per_year, args.elective_ratio,
+                    args.density, args.seed, args.time_limit)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,366 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cozucu import Backend, MipBackend, Solution
+from proje import CourseScheduler
+from rapor import RunReport
+
+# Neighbourhoods a round may free, each drawn at random from the incumbent:
+#   year     every course of one course year
+#   teacher  the courses one teacher, or a teacher they share a course with, can teach
+#   day      every course scheduled on one day
+#   room     the courses in a block of room classes of neighbouring capacity
+NEIGHBOURHOODS = ('year', 'teacher', 'day', 'room')
+
+
+class Occupancy:
+    # Slots taken by a set of (class) keys: bitmasks per (teacher, day) and
+    # per (year, day) of mandatory courses, and per (room class, day) the
+    # number of courses in every slot
+    def __init__(self, scheduler, keys=()):
+        self.scheduler = scheduler
+        self.teachers = {}
+        self.years = {}
+        self.rooms = {}
+        for key in keys:
+            self.add(key)
+
+    def footprint(self, key):
+        return self.scheduler.grid.footprint(key[4], self.scheduler.course_slots[key[0]])
+
+    def add(self, key):
+        s = self.scheduler
+        course_idx, teacher_idx, room_idx, day, start = key
+        footprint = self.footprint(key)
+        self.teachers[(teacher_idx, day)] = self.teachers.get((teacher_idx, day), 0) | footprint
+        if s.is_elective[course_idx] == 0:
+            year = (s.course_years[course_idx], day)
+            self.years[year] = self.years.get(year, 0) | footprint
+        counts = self.rooms.setdefault((room_idx, day), [0] * s.grid.slots)
+        for slot in range(start, start + s.course_slots[course_idx]):
+            counts[slot] += 1
+
+    def used(self, room_idx, day, slot):
+        counts = self.rooms.get((room_idx, day))
+        return counts[slot] if counts else 0
+
+    def fits(self, key):
+        s = self.scheduler
+        course_idx, teacher_idx, room_idx, day, start = key
+        footprint = self.footprint(key)
+        if self.teachers.get((teacher_idx, day), 0) & footprint:
+            return False
+        if s.is_elective[course_idx] == 0 and self.years.get((s.course_years[course_idx], day), 0) & footprint:
+            return False
+        counts = self.rooms.get((room_idx, day))
+        rooms = len(s.data.class_rooms[room_idx])
+        return not counts or all(counts[slot] < rooms
+                                 for slot in range(start, start + s.course_slots[course_idx]))
+
+
+class NeighbourhoodScheduler(CourseScheduler):
+    # The base scheduler with every course outside `freed` fixed to its key
+    # in `incumbent`. The fixed courses are not in the model: their slots
+    # are taken out of the freed courses' candidates and their rooms out of
+    # the room class capacities, so the model holds the freed courses only.
+    # Rooms stay room classes; the caller assigns them once for the whole
+    # schedule.
+    def __init__(self, base, keys, incumbent, freed):
+        self.__dict__.update(base.__dict__)
+        self.report = RunReport()
+        self.solution_path = None
+        self.freed = sorted(freed)
+        freed = set(freed)
+        self.hint = [key for key in incumbent if key[0] in freed]
+        self.fixed = []
+        self.occupied = Occupancy(self, [key for key in incumbent if key[0] not in freed])
+        own = keys[np.isin(keys[:, 0], self.freed)]
+        self.candidates = [key for key in map(tuple, own.tolist()) if self.occupied.fits(key)]
+
+    def presolve(self):
+        return self.candidates
+
+    def add_course_assignment_constraints(self, solver):
+        for course_idx in self.freed:
+            solver.Add(sum(self.course_index.get(course_idx, [])) == 1)
+
+    def add_room_constraints(self, solver):
+        # A room class keeps the rooms the fixed courses leave free
+        for (room_idx, day, slot), time_vars in self.room_index.items():
+            rooms = len(self.data.class_rooms[room_idx]) - self.occupied.used(room_idx, day, slot)
+            if len(time_vars) > rooms:
+                solver.Add(sum(time_vars) <= rooms)
+
+    def assign_rooms(self, keys):
+        return list(keys)
+
+
+def evaluate(base, keys, incumbent, freed, time_limit, backend=None):
+    # Re-optimise the freed courses with the rest of incumbent fixed.
+    # Returns (status, gain, keys of the freed courses)
+    scheduler = NeighbourhoodScheduler(base, keys, incumbent, freed)
+    before = int(scheduler.preference_scores(scheduler.hint).sum()) if scheduler.hint else 0
+    backend = backend or MipBackend()
+    backend.time_limit = time_limit
+    solution = backend.solve(scheduler)
+    if not solution.found:
+        return solution.status, None, []
+    chosen = solution.assignments
+    return solution.status, int(scheduler.preference_scores(chosen).sum()) - before, chosen
+
+
+# Set in every worker process by init_worker, so the base scheduler is
+# pickled once per worker rather than once per neighbourhood
+_base = None
+
+
+def init_worker(base, keys):
+    global _base
+    _base = (base, keys)
+
+
+def evaluate_in_worker(incumbent, freed, time_limit):
+    base, keys = _base
+    return evaluate(base, keys, incumbent, freed, time_limit)
+
+
+class LnsBackend(Backend):
+    # Large neighbourhood search over the SCIP model. Starts from a greedy
+    # schedule (repaired by sub-solves where greedy leaves courses out),
+    # then every round frees `parallel` random neighbourhoods of at most
+    # max_courses courses, re-optimises each with everything else fixed
+    # under step_limit seconds, and keeps the improvements that do not
+    # clash. time_limit bounds the whole search; it also stops after
+    # `patience` rounds without improvement, or within relative_gap of the
+    # sum of the best score of every course. With the same seed and
+    # sub-solves finishing within step_limit, runs are reproducible
+    # whatever max_workers is; parallel defaults to max_workers.
+    name = 'lns'
+    streams_incumbents = True
+
+    def __init__(self, seed=0, step_limit=5.0, max_courses=40, parallel=None, max_workers=None,
+                 patience=30, neighbourhoods=NEIGHBOURHOODS, **limits):
+        super().__init__(**limits)
+        self.seed = seed
+        self.step_limit = step_limit
+        self.max_courses = max_courses
+        self.max_workers = max_workers
+        self.parallel = parallel or max_workers or 1
+        self.patience = patience
+        self.neighbourhoods = tuple(neighbourhoods)
+        unknown = set(self.neighbourhoods) - set(NEIGHBOURHOODS)
+        if unknown:
+            raise ValueError(f"Unknown neighbourhoods {', '.join(sorted(unknown))}: use {', '.join(NEIGHBOURHOODS)}")
+        self.inner = None  # in-process sub-solve, so that cancel() reaches it
+        self.history = []  # {'elapsed', 'round', 'objective', 'neighbourhoods'} per improvement
+
+    def cancel(self):
+        super().cancel()
+        if self.inner is not None:
+            self.inner.cancel()
+
+    def greedy(self, scheduler, keys, scores):
+        # Place fixed and hinted keys first, then every other course, fewest
+        # candidates first, at its best-scoring candidate that still fits.
+        # Returns {course: key} of the courses placed.
+        placed = {}
+        occupied = Occupancy(scheduler)
+        candidates = set(map(tuple, keys.tolist()))
+        for key in scheduler.class_keys(scheduler.fixed) + scheduler.class_keys(scheduler.hint):
+            if key[0] not in placed and key in candidates and occupied.fits(key):
+                placed[key[0]] = key
+                occupied.add(key)
+
+        by_course = {}
+        for key, score in zip(map(tuple, keys.tolist()), scores.tolist()):
+            by_course.setdefault(key[0], []).append((-score, key))
+        for course_idx in sorted(by_course, key=lambda c: (len(by_course[c]), c)):
+            if course_idx in placed:
+                continue
+            for _, key in sorted(by_course[course_idx]):
+                if occupied.fits(key):
+                    placed[course_idx] = key
+                    occupied.add(key)
+                    break
+        return placed
+
+    def repair(self, scheduler, keys, placed, deadline):
+        # Sub-solve the courses greedy left out together with every course
+        # sharing a teacher or a mandatory year with them; failing that,
+        # the whole model. Returns the complete incumbent or None.
+        data = scheduler.data
+        courses = len(scheduler.course_hours)
+        missing = [c for c in range(courses) if c not in placed]
+        teachers = {t for c in missing for t in data.course_teachers[c]}
+        years = {scheduler.course_years[c] for c in missing if scheduler.is_elective[c] == 0}
+        related = {c for c in range(courses)
+                   if teachers & set(data.course_teachers[c]) or
+                   (scheduler.is_elective[c] == 0 and scheduler.course_years[c] in years)}
+        frozen = {key[0] for key in scheduler.fixed} - set(missing)
+        incumbent = list(placed.values())
+        for freed in (related | set(missing), set(range(courses))):
+            freed -= frozen
+            self.inner = MipBackend()
+            limit = None if deadline == float('inf') else max(deadline - time.time(), 1.0)
+            status, _, chosen = evaluate(scheduler, keys, incumbent, freed, limit, self.inner)
+            self.inner = None
+            if chosen:
+                return [key for key in incumbent if key[0] not in freed] + chosen
+            if self.cancelled:
+                break
+        return None
+
+    def neighbourhood(self, rng, scheduler, incumbent, kind, frozen):
+        # Courses freed by one random neighbourhood of the given kind
+        data = scheduler.data
+        by_course = {key[0]: key for key in incumbent}
+        courses = range(len(scheduler.course_hours))
+        if kind == 'year':
+            year = rng.choice(sorted(set(scheduler.course_years)))
+            freed = [c for c in courses if scheduler.course_years[c] == year]
+        elif kind == 'teacher':
+            teacher_idx = rng.choice(sorted({t for teachers in data.course_teachers for t in teachers}))
+            group = {t for teachers in data.course_teachers if teacher_idx in teachers for t in teachers}
+            freed = [c for c in courses if group & set(data.course_teachers[c])]
+        elif kind == 'day':
+            day = rng.choice(list(scheduler.days))
+            freed = [c for c in courses if by_course[c][3] == day]
+        else:
+            classes = sorted(set(data.room_class), key=lambda r: (scheduler.room_capacities[r], r))
+            first = rng.randrange(len(classes))
+            block = set(classes[first:first + 3])
+            freed = [c for c in courses if by_course[c][2] in block]
+        freed = [c for c in freed if c not in frozen]
+        if len(freed) > self.max_courses:
+            freed = sorted(rng.sample(freed, self.max_courses))
+        return freed
+
+    def merge(self, scheduler, incumbent, results):
+        # Apply the best improvement, then every other one that frees none
+        # of the courses already changed and still fits the schedule.
+        # Returns the new incumbent and the kinds applied.
+        applied, changed = [], set()
+        for gain, _, kind, freed, chosen in sorted(results, key=lambda result: (-result[0], result[1])):
+            if changed & set(freed):
+                continue
+            kept = [key for key in incumbent if key[0] not in set(freed)]
+            occupied = Occupancy(scheduler, kept)
+            fits = True
+            for key in chosen:
+                if not occupied.fits(key):
+                    fits = False
+                    break
+                occupied.add(key)
+            if fits:
+                incumbent = kept + chosen
+                changed |= set(freed)
+                applied.append(kind)
+        return incumbent, applied
+
+    def solve(self, scheduler):
+        start = time.time()
+        deadline = start + self.time_limit if self.time_limit is not None else float('inf')
+        report = scheduler.report
+        rng = random.Random(self.seed)
+        log = self.open_log()
+
+        with report.phase('presolve'):
+            keys = np.array(scheduler.presolve(), dtype=np.int64).reshape(-1, 5)
+        report.count('variables', variables=len(keys))
+        scores = scheduler.preference_scores(keys)
+        # No schedule scores more than every course at its best candidate
+        best = np.full(len(scheduler.course_hours), -np.inf)
+        np.maximum.at(best, keys[:, 0], scores)
+        bound = float(best.sum())
+
+        with report.phase('greedy'):
+            placed = self.greedy(scheduler, keys, scores)
+        if len(placed) == len(scheduler.course_hours):
+            incumbent = list(placed.values())
+        else:
+            with report.phase('repair'):
+                incumbent = self.repair(scheduler, keys, placed, deadline)
+        if incumbent is None:
+            status = 'NOT_SOLVED' if self.cancelled or time.time() >= deadline else 'INFEASIBLE'
+            solution = Solution(self.name, status, wall_time=time.time() - start)
+            report.solver.update({'backend': self.name, 'status': status, 'rounds': 0, 'history': []})
+            return solution
+
+        objective = int(scheduler.preference_scores(incumbent).sum())
+        frozen = {key[0] for key in scheduler.class_keys(scheduler.fixed)}
+        self.history = [{'elapsed': time.time() - start, 'round': 0, 'objective': objective,
+                         'neighbourhoods': ['start']}]
+        self.report_incumbent(scheduler, log, incumbent, objective, bound)
+
+        pool = None
+        if self.max_workers != 1 and self.parallel > 1:
+            pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_worker,
+                                       initargs=(scheduler, keys))
+        rounds = stalled = 0
+        try:
+            with report.phase('lns'):
+                while not self.stop(objective, bound, stalled, deadline):
+                    rounds += 1
+                    step = min(self.step_limit, max(deadline - time.time(), 0.1))
+                    draws = []
+                    for _ in range(self.parallel):
+                        kind = rng.choice(self.neighbourhoods)
+                        draws.append((kind, self.neighbourhood(rng, scheduler, incumbent, kind, frozen)))
+                    draws = [(kind, freed) for kind, freed in draws if freed]
+                    if pool is None:
+                        outcomes = []
+                        for kind, freed in draws:
+                            self.inner = MipBackend()
+                            outcomes.append(evaluate(scheduler, keys, incumbent, freed, step, self.inner))
+                            self.inner = None
+                    else:
+                        futures = [pool.submit(evaluate_in_worker, incumbent, freed, step) for _, freed in draws]
+                        outcomes = [future.result() for future in futures]
+
+                    # Moves to an equally good schedule are taken too, to
+                    # leave plateaus, but only improvements reset patience
+                    results = [(gain, idx, kind, freed, chosen)
+                               for idx, ((kind, freed), (_, gain, chosen)) in enumerate(zip(draws, outcomes))
+                               if gain is not None and gain >= 0]
+                    incumbent, applied = self.merge(scheduler, incumbent, results)
+                    previous, objective = objective, int(scheduler.preference_scores(incumbent).sum())
+                    if objective <= previous:
+                        stalled += 1
+                        continue
+                    stalled = 0
+                    self.history.append({'elapsed': time.time() - start, 'round': rounds,
+                                         'objective': objective, 'neighbourhoods': applied})
+                    self.report_incumbent(scheduler, log, incumbent, objective, bound)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        status = 'OPTIMAL' if objective >= bound else 'FEASIBLE'
+        report.solver.update({
+            'backend': self.name,
+            'status': status,
+            'seed': self.seed,
+            'rounds': rounds,
+            'history': self.history,
+            'wall_time': time.time() - start,
+        })
+        solution = Solution(self.name, status, objective=float(objective), bound=bound)
+        with report.phase('assign_rooms'):
+            solution.assignments = scheduler.assign_rooms(incumbent)
+        solution.wall_time = time.time() - start
+        return solution
+
+    def stop(self, objective, bound, stalled, deadline):
+        if self.cancelled or stalled >= self.patience or time.time() >= deadline:
+            return True
+        gap = (bound - objective) / max(abs(objective), 1.0)
+        return gap <= (self.relative_gap or 0.0)
+
+    def report_incumbent(self, scheduler, log, incumbent, objective, bound):
+        if self.on_incumbent is not None:
+            self.on_incumbent(float(objective), bound)
+        if log is not None:
+            log.record(float(objective), bound, scheduler.assign_rooms(incumbent))
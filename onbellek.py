@@ -0,0 +1,130 @@
+import argparse
+import hashlib
+import json
+import os
+
+from google.protobuf.message import DecodeError
+from ortools.linear_solver import linear_solver_pb2, pywraplp
+
+# Bump when the model formulation changes so that old entries stop matching
+CACHE_VERSION = 3
+
+
+class ModelCache:
+    # Content-addressed store of built pywraplp models. An entry is keyed by
+    # the hash of the three input tables, the time grid and the solver
+    # configuration, and holds the exported MPModelProto plus the variable
+    # keys in column order. The least recently used entries are evicted
+    # beyond max_bytes; unreadable entries count as misses and are removed.
+    def __init__(self, directory='.model_cache', max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, scheduler, solver_id):
+        digest = hashlib.sha256(f'v{CACHE_VERSION}:{solver_id}'.encode())
+        digest.update(json.dumps(scheduler.grid.to_dict(), sort_keys=True).encode('utf-8'))
+        for table in scheduler.TABLES:
+            digest.update(getattr(scheduler, f'{table}_df').to_csv(index=False).encode('utf-8'))
+        return digest.hexdigest()
+
+    def paths(self, key):
+        return (os.path.join(self.directory, f'{key}.pb'),
+                os.path.join(self.directory, f'{key}.json'))
+
+    def load(self, key, scheduler, solver_id):
+        # Rebuild the solver from a cached entry and restore scheduler.x;
+        # returns None on a miss
+        model_path, meta_path = self.paths(key)
+        if not (os.path.exists(model_path) and os.path.exists(meta_path)):
+            return None
+
+        solver = pywraplp.Solver.CreateSolver(solver_id)
+        try:
+            proto = linear_solver_pb2.MPModelProto()
+            with open(model_path, 'rb') as f:
+                proto.ParseFromString(f.read())
+            with open(meta_path) as f:
+                meta = json.load(f)
+            keys = [tuple(key) for key in meta['keys']]
+            presolve_stats = dict(meta['presolve_stats'])
+            error = solver.LoadModelFromProto(proto)
+        except (OSError, DecodeError, ValueError, KeyError, TypeError):
+            error = 'unreadable entry'
+        if error or len(keys) != solver.NumVariables():
+            # A truncated or corrupt entry: drop it and rebuild the model
+            self.remove(key)
+            return None
+
+        scheduler.candidates = keys
+        scheduler.presolve_stats = presolve_stats
+        scheduler.x = dict(zip(keys, solver.variables()))
+        for path in (model_path, meta_path):
+            os.utime(path)
+        return solver
+
+    def store(self, key, scheduler, solver):
+        os.makedirs(self.directory, exist_ok=True)
+        model_path, meta_path = self.paths(key)
+
+        proto = linear_solver_pb2.MPModelProto()
+        solver.ExportModelToProto(proto)
+        with open(model_path, 'wb') as f:
+            f.write(proto.SerializeToString())
+        with open(meta_path, 'w') as f:
+            json.dump({
+                'keys': [[int(v) for v in key] for key in scheduler.x],
+                'presolve_stats': scheduler.presolve_stats,
+            }, f)
+        self.evict()
+
+    def entries(self):
+        # (last use, size, key) of every complete entry, oldest first
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pb'):
+                continue
+            key = name[:-len('.pb')]
+            model_path, meta_path = self.paths(key)
+            if not os.path.exists(meta_path):
+                continue
+            size = os.path.getsize(model_path) + os.path.getsize(meta_path)
+            entries.append((os.path.getmtime(model_path), size, key))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        while entries and total > self.max_bytes:
+            _, size, key = entries.pop(0)
+            self.remove(key)
+            total -= size
+
+    def remove(self, key):
+        for path in self.paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def clear(self):
+        entries = self.entries()
+        for _, _, key in entries:
+            self.remove(key)
+        return len(entries)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the built-model cache")
+    parser.add_argument('--cache-dir', default='.model_cache')
+    parser.add_argument('--clear', action='store_true', help="remove every cached model")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    cache = ModelCache(args.cache_dir)
+    if args.clear:
+        print(f"Removed {cache.clear()} cached models from {args.cache_dir}")
+    else:
+        for last_use, size, key in cache.entries():
+            print(f"{key[:16]}  {size / 1024:10.1f} KB")
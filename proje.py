@@ -1,223 +1,532 @@
 from ortools.linear_solver import pywraplp
-import pandas as pd
 import numpy as np
-import io
+import argparse
+import datetime
+import json
+import os
 import sys
 
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+from bolme import PartitionedBackend
+from cizelge import Schedule
+from cozucu import BACKENDS, CpSatBackend, MipBackend
+from onbellek import ModelCache
+from rapor import RunReport
+from tani import diagnose, explain, print_explanation
+from veri import TABLES, DataSource, Dataset
+from zaman import TimeGrid
+
 class CourseScheduler:
-    def __init__(self):
-        # Time slots (assuming 9:00 to 17:00)
-        self.time_slots = list(range(9, 12)) + list(range(13, 17))  # Excluding 12:00-13:00
-        self.days = range(5)  # Monday to Friday
+    TABLES = TABLES
+    
+    def __init__(self, solution_path='last_solution.json', data_dir='.', source=None, tables=None,
+                 grid=None):
+        # The teaching week (by default Monday to Friday, 9:00 to 17:00 in
+        # hourly slots with a break at 12:00); the start of every key is a
+        # slot index of this grid
+        self.grid = grid or TimeGrid()
+        self.days = range(self.grid.days)
+        
+        # Per-phase timings, model sizes and solver statistics of this run
+        self.report = RunReport()
+        
+        # Read the input tables (CSV files by default, see veri.DataSource)
+        # unless they are passed in directly
+        with self.report.phase('load'):
+            if tables is None:
+                tables = (source or DataSource(data_dir)).read_tables()
+            self.courses_df = tables['courses']
+            self.rooms_df = tables['rooms']
+            self.teachers_df = tables['teachers']
+        
+        # Warm start for incremental runs: keys to hint to the solver and
+        # keys to fix to 1 (see load_previous)
+        self.solution_path = solution_path
+        self.hint = []
+        self.fixed = []
+        
+        with self.report.phase('preprocess'):
+            self.preprocess()
+    
+    def preprocess(self):
+        # Convert the tables once into typed arrays; the model code never
+        # touches the DataFrames again
+        self.data = Dataset(self.courses_df, self.rooms_df, self.teachers_df)
+        
+        # Plain lists for the per-element lookups in the model-building loops
+        self.course_hours = self.data.course_hours.tolist()
+        self.course_years = self.data.course_years.tolist()
+        self.is_elective = self.data.is_elective.tolist()
+        self.course_students = self.data.course_students.tolist()
+        self.room_capacities = self.data.room_capacities.tolist()
+        self.availability = self.data.availability
+        self.preferences = self.data.preferences
+        
+        shape = (self.grid.days, self.grid.slots)
+        if self.availability.shape[1:] != shape or self.preferences.shape[1:] != shape:
+            raise ValueError(f"Teacher availability and preferences must be {shape[0]} days x "
+                             f"{shape[1]} slots to match the time grid, got "
+                             f"{' x '.join(map(str, self.availability.shape[1:]))}")
+        
+        # Slots taken by each course on the grid
+        self.course_slots = [self.grid.length(hours) for hours in self.course_hours]
+        
+        # Per (teacher, day) bitmasks of the slots the teacher is available
+        # in and of the slots a course may start in (preference above 0)
+        self.available_masks = self.grid.masks(self.availability).tolist()
+        self.start_masks = self.grid.masks(self.preferences).tolist()
         
-        # Read data from CSV files
-        self.courses_df = pd.read_csv('courses.csv')
-        self.rooms_df = pd.read_csv('rooms.csv')
-        self.teachers_df = pd.read_csv('teachers.csv')
+        # Running sums of each teacher's slot preferences give the score of
+        # any [start, start + slots) window with two lookups
+        self.preference_sums = np.zeros(self.preferences.shape[:2] + (self.preferences.shape[2] + 1,), dtype=np.int32)
+        np.cumsum(self.preferences, axis=2, out=self.preference_sums[:, :, 1:])
     
-    def create_model(self):
+    def preference_scores(self, keys):
+        # Objective coefficient of each (course, teacher, room, day, start) key
+        keys = np.asarray(keys, dtype=np.int64).reshape(-1, 5)
+        teachers, days, starts = keys[:, 1], keys[:, 3], keys[:, 4]
+        ends = starts + np.asarray(self.course_slots, dtype=np.int64)[keys[:, 0]]
+        return (self.preference_sums[teachers, days, ends] -
+                self.preference_sums[teachers, days, starts])
+    
+    def presolve(self):
+        # Enumerate candidate (course, teacher, room, day, start slot) tuples and
+        # drop every one that a constraint would force to zero, so no variable
+        # is created for it. A tuple is counted under the first rule removing it.
+        # Every test is one bitwise operation on the course footprint.
+        # Interchangeable rooms share one variable (see veri.Dataset.room_class):
+        # the room of a candidate is the first room of its class, and the
+        # other copies are counted under room_class.
+        self.presolve_stats = {'room': 0, 'break': 0, 'availability': 0, 'preference': 0,
+                               'room_class': 0}
+        self.candidates = []
+        capacities = self.room_capacities
+        break_mask = self.grid.break_mask
+        starts = {length: self.grid.starts(length) for length in set(self.course_slots)}
+        
+        for course_idx, length in enumerate(self.course_slots):
+            # Rooms too small for the course (or of another department)
+            rooms = self.data.course_rooms[course_idx]
+            classes = self.data.course_classes[course_idx]
+            unusable = len(capacities) - len(rooms)
+            
+            for teacher_idx in self.data.course_teachers[course_idx]:
+                for day in self.days:
+                    available = self.available_masks[teacher_idx][day]
+                    startable = self.start_masks[teacher_idx][day]
+                    for start, footprint in starts[length]:
+                        self.presolve_stats['room'] += unusable
+                        
+                        # Courses can't overlap a break
+                        if footprint & break_mask:
+                            self.presolve_stats['break'] += len(rooms)
+                            continue
+                        # The teacher must be available for every slot taught
+                        if footprint & available != footprint:
+                            self.presolve_stats['availability'] += len(rooms)
+                            continue
+                        # Courses can't start in a slot the teacher rated 0
+                        if not startable >> start & 1:
+                            self.presolve_stats['preference'] += len(rooms)
+                            continue
+                        
+                        self.presolve_stats['room_class'] += len(rooms) - len(classes)
+                        for room_idx in classes:
+                            self.candidates.append((course_idx, teacher_idx, room_idx, day, start))
+        
+        return self.candidates
+    
+    def create_model(self, solver_id='SCIP', cache=None):
+        # Reuse a model built from identical inputs if one is cached
+        if cache is not None:
+            cache_key = cache.key(self, solver_id)
+            with self.report.phase('load_cached_model'):
+                solver = cache.load(cache_key, self, solver_id)
+            if solver is not None:
+                self.report.count('variables', variables=solver.NumVariables())
+                self.report.count('cached_model', constraints=solver.NumConstraints())
+                return solver
+        
         # Create the solver
-        solver = pywraplp.Solver.CreateSolver('SCIP')
+        solver = pywraplp.Solver.CreateSolver(solver_id)
         
         # Create variables
-        # x[course, teacher, room, day, start_time] = 1 if the course is scheduled
+        # x[course, teacher, room, day, start] = 1 if the course is scheduled
         self.x = {}
         
-        for course_idx, course in self.courses_df.iterrows():
-            course_hours = course['hours']
-            possible_teachers = str(course['possible_teachers']).split(';')
-            
-            for teacher_idx, teacher in self.teachers_df.iterrows():
-                if teacher['name'] in possible_teachers:
-                    for room_idx, room in self.rooms_df.iterrows():
-                        if room['capacity'] >= course['students']:
-                            for day in self.days:
-                                # Morning slots
-                                for start_time in range(9, 13 - course_hours):
-                                    self.x[course_idx, teacher_idx, room_idx, day, start_time] = \
-                                        solver.IntVar(0, 1, f'x_{course_idx}_{teacher_idx}_{room_idx}_{day}_{start_time}')
-                                # Afternoon slots
-                                for start_time in range(13, 17 - course_hours + 1):
-                                    self.x[course_idx, teacher_idx, room_idx, day, start_time] = \
-                                        solver.IntVar(0, 1, f'x_{course_idx}_{teacher_idx}_{room_idx}_{day}_{start_time}')
+        # Inverted indexes filled while the variables are created, so each
+        # constraint family below is emitted in one pass over its index
+        self.course_index = {}   # course -> vars
+        self.teacher_index = {}  # (teacher, day, slot) -> vars occupying that slot
+        self.room_index = {}     # (room class, day, slot) -> vars occupying that slot
+        self.year_index = {}     # (course_year, day, slot) -> mandatory vars occupying that slot
+        
+        with self.report.phase('presolve'):
+            self.presolve()
+        with self.report.phase('create_variables'):
+            for key in self.candidates:
+                self.add_variable(solver, key)
+        self.report.count('variables', variables=solver.NumVariables())
         
         # Add constraints
-        self.add_course_assignment_constraints(solver)
-        self.add_teacher_constraints(solver)
-        self.add_room_constraints(solver)
-        self.add_preference_constraints(solver)
-        self.add_elective_constraints(solver)
-        self.add_mandatory_course_constraints(solver)
-        self.add_noon_break_constraint(solver)
+        self.family_rows = {}
+        self.add_constraints(solver, self.add_course_assignment_constraints)
+        self.add_constraints(solver, self.add_teacher_constraints)
+        self.add_constraints(solver, self.add_room_constraints)
+        self.add_constraints(solver, self.add_elective_constraints)
+        self.add_constraints(solver, self.add_mandatory_course_constraints)
         
         # Set objective function
-        self.set_objective_function(solver)
+        with self.report.phase('set_objective_function'):
+            self.set_objective_function(solver)
         
+        if cache is not None:
+            with self.report.phase('store_cached_model'):
+                cache.store(cache_key, self, solver)
         return solver
     
+    def add_constraints(self, solver, family):
+        # Run one add_*_constraints method, recording its time and row count
+        # and the range of rows it added (see tani.explain)
+        first = solver.NumConstraints()
+        with self.report.family(family.__name__, solver):
+            family(solver)
+        self.family_rows[family.__name__] = (first, solver.NumConstraints())
+    
+    def add_variable(self, solver, key):
+        course_idx, teacher_idx, room_idx, day, start = key
+        var = solver.IntVar(0, 1, f'x_{course_idx}_{teacher_idx}_{room_idx}_{day}_{start}')
+        self.x[key] = var
+        
+        self.course_index.setdefault(course_idx, []).append(var)
+        for slot in range(start, start + self.course_slots[course_idx]):
+            self.teacher_index.setdefault((teacher_idx, day, slot), []).append(var)
+            self.room_index.setdefault((room_idx, day, slot), []).append(var)
+            if self.is_elective[course_idx] == 0:
+                self.year_index.setdefault((self.course_years[course_idx], day, slot), []).append(var)
+        return var
+    
     def add_course_assignment_constraints(self, solver):
         # Each course must be assigned exactly once
-        for course_idx, course in self.courses_df.iterrows():
-            course_vars = []
-            for key, var in self.x.items():
-                if key[0] == course_idx:
-                    course_vars.append(var)
-            solver.Add(sum(course_vars) == 1)
+        for course_idx in range(len(self.course_hours)):
+            solver.Add(sum(self.course_index.get(course_idx, [])) == 1)
     
     def add_teacher_constraints(self, solver):
         # Teachers can't teach multiple courses at the same time
-        for teacher_idx, teacher in self.teachers_df.iterrows():
-            for day in self.days:
-                for time in self.time_slots:
-                    time_vars = []
-                    for key, var in self.x.items():
-                        course_idx, t_idx, room_idx, d, start_time = key
-                        course_hours = self.courses_df.iloc[course_idx]['hours']
-                        if (t_idx == teacher_idx and d == day and 
-                            start_time <= time < start_time + course_hours):
-                            time_vars.append(var)
-                    solver.Add(sum(time_vars) <= 1)
-                    
-                    # Add teacher availability constraints
-                    availability = eval(teacher['availability'])
-                    if not availability[day][time-9]:  # Convert time to 0-based index
-                        solver.Add(sum(time_vars) == 0)
+        # (availability is enforced by presolve; single-variable rows are implied
+        # by the variable bounds and skipped)
+        for time_vars in self.teacher_index.values():
+            if len(time_vars) > 1:
+                solver.Add(sum(time_vars) <= 1)
     
     def add_room_constraints(self, solver):
-        # Rooms can't host multiple courses at the same time
-        for room_idx, room in self.rooms_df.iterrows():
-            for day in self.days:
-                for time in self.time_slots:
-                    time_vars = []
-                    for key, var in self.x.items():
-                        course_idx, teacher_idx, r_idx, d, start_time = key
-                        course_hours = self.courses_df.iloc[course_idx]['hours']
-                        if (r_idx == room_idx and d == day and 
-                            start_time <= time < start_time + course_hours):
-                            time_vars.append(var)
-                    solver.Add(sum(time_vars) <= 1)
-    
-    def add_preference_constraints(self, solver):
-        # Add constraints to respect teacher preferences
-        for teacher_idx, teacher in self.teachers_df.iterrows():
-            preferences = eval(teacher['preferences'])
-            for day in self.days:
-                for start_time in self.time_slots:
-                    preference_value = preferences[day][start_time - 9]
-                    if preference_value == 0:
-                        time_vars = []
-                        for key, var in self.x.items():
-                            course_idx, t_idx, room_idx, d, s_time = key
-                            if (t_idx == teacher_idx and d == day and s_time == start_time):
-                                time_vars.append(var)
-                        solver.Add(sum(time_vars) == 0)
+        # Rooms can't host multiple courses at the same time: a class of
+        # interchangeable rooms hosts at most as many courses as it has rooms
+        for (room_idx, day, slot), time_vars in self.room_index.items():
+            rooms = len(self.data.class_rooms[room_idx])
+            if len(time_vars) > rooms:
+                solver.Add(sum(time_vars) <= rooms)
+    
+    def class_keys(self, keys):
+        # Keys with their room replaced by its room class, as in self.x
+        return [(c, t, self.data.room_class[r], d, s) for c, t, r, d, s in keys]
+    
+    def assign_rooms(self, keys):
+        # Replace the room class of each chosen key by one of its rooms. Within
+        # a class, courses are taken by day and start slot and get the first
+        # room whose occupied slots miss their footprint (preferring the room
+        # of the previous run, see load_previous); as no slot holds more
+        # courses than the class has rooms, a free room always exists.
+        previous = {(c, t, d, s): r for c, t, r, d, s in self.hint}
+        busy = {}  # (room, day) -> bitmask of occupied slots
+        assigned = []
+        for course_idx, teacher_idx, room_idx, day, start in sorted(keys, key=lambda k: (k[3], k[4], k[0])):
+            footprint = self.grid.footprint(start, self.course_slots[course_idx])
+            free = [r for r in self.data.class_rooms[room_idx] if not busy.get((r, day), 0) & footprint]
+            room = previous.get((course_idx, teacher_idx, day, start))
+            if room not in free:
+                room = free[0]
+            busy[(room, day)] = busy.get((room, day), 0) | footprint
+            assigned.append((course_idx, teacher_idx, room, day, start))
+        return assigned
     
     def add_elective_constraints(self, solver):
         # Elective courses can be scheduled at any time
         pass
     
     def add_mandatory_course_constraints(self, solver):
-        # Mandatory courses of the same year should not overlap
-        for course_idx_1, course_1 in self.courses_df.iterrows():
-            if course_1['is_elective'] == 0:
-                for course_idx_2, course_2 in self.courses_df.iterrows():
-                    if (course_idx_1 != course_idx_2 and 
-                        course_2['is_elective'] == 0 and
-                        course_1['course_year'] == course_2['course_year']):
-                        
-                        for teacher_idx_1, _ in self.teachers_df.iterrows():
-                            for teacher_idx_2, _ in self.teachers_df.iterrows():
-                                for room_idx_1, _ in self.rooms_df.iterrows():
-                                    for room_idx_2, _ in self.rooms_df.iterrows():
-                                        for day in self.days:
-                                            for start_time_1 in self.time_slots:
-                                                for start_time_2 in self.time_slots:
-                                                    if (start_time_1 <= start_time_2 + course_2['hours'] - 1 and
-                                                        start_time_2 <= start_time_1 + course_1['hours'] - 1):
-                                                        key1 = (course_idx_1, teacher_idx_1, room_idx_1, day, start_time_1)
-                                                        key2 = (course_idx_2, teacher_idx_2, room_idx_2, day, start_time_2)
-                                                        if key1 in self.x and key2 in self.x:
-                                                            solver.Add(self.x[key1] + self.x[key2] <= 1)
+        # Mandatory courses of the same year should not overlap: at most one
+        # of them may occupy any slot. Variables of a single course are already
+        # limited to one by the assignment constraint, so this is equivalent to
+        # forbidding every overlapping pair.
+        for time_vars in self.year_index.values():
+            if len(time_vars) > 1:
+                solver.Add(sum(time_vars) <= 1)
 
-    def add_noon_break_constraint(self, solver):
-            # Ensure no courses overlap with noon break (12:00-13:00)
-            for day in self.days:
-                for room_idx, _ in self.rooms_df.iterrows():
-                    noon_break_vars = []
-                    for key, var in self.x.items():
-                        course_idx, teacher_idx, r_idx, d, start_time = key
-                        course_hours = self.courses_df.iloc[course_idx]['hours']
-                        # Check if the course would overlap with noon break
-                        if (d == day and r_idx == room_idx and 
-                            ((start_time < 12 and start_time + course_hours > 12) or
-                            (start_time == 12))):
-                            noon_break_vars.append(var)
-                    solver.Add(sum(noon_break_vars) == 0)
-    
     def set_objective_function(self, solver):
         objective = solver.Objective()
         
         # For each assignment, add its preference value to the objective
-        for key, var in self.x.items():
-            course_idx, teacher_idx, room_idx, day, start_time = key
-            course_hours = self.courses_df.iloc[course_idx]['hours']
-            teacher_preferences = eval(self.teachers_df.iloc[teacher_idx]['preferences'])
-            
-            # Calculate preference value for this assignment
-            preference_value = 0
-            for hour in range(course_hours):
-                current_time = start_time + hour
-                if current_time != 12:  # Skip noon break hour
-                    adjusted_time = current_time if current_time < 12 else current_time - 1
-                    if adjusted_time - 9 < len(teacher_preferences[day]):
-                        preference_value += teacher_preferences[day][adjusted_time - 9]
-            
-            # Add to objective with appropriate coefficient
+        scores = self.preference_scores(list(self.x.keys()))
+        for var, preference_value in zip(self.x.values(), scores.tolist()):
             objective.SetCoefficient(var, preference_value)
         
         objective.SetMaximization()
     
-    def solve(self):
-        solver = self.create_model()
-        status = solver.Solve()
+    def snapshot(self):
+        # Rows of the input tables keyed by name, to diff the next run against
+        snapshot = {}
+        for table in self.TABLES:
+            df = getattr(self, f'{table}_df').astype(str)
+            snapshot[table] = {row[0]: row for row in df.values.tolist()}
+        return snapshot
+    
+    def save_solution(self, solution):
+        assignments = []
+        for course_idx, teacher_idx, room_idx, day, start in solution.assignments:
+            assignments.append({
+                'course': self.data.course_names[course_idx],
+                'teacher': self.data.teacher_names[teacher_idx],
+                'room': self.data.room_names[room_idx],
+                'day': int(day),
+                'start': self.grid.label(start),
+            })
+        with open(self.solution_path, 'w', encoding='utf-8') as f:
+            json.dump({'tables': self.snapshot(), 'assignments': assignments}, f, ensure_ascii=False)
+    
+    def load_previous(self, fix_untouched=False):
+        # Diff the current tables against the last saved run and turn its
+        # assignments into a solver hint. With fix_untouched, assignments whose
+        # course, teacher and room rows are all unchanged are fixed as well.
+        # Returns the changed names per table, or None without a previous run.
+        if not os.path.exists(self.solution_path):
+            return None
+        with open(self.solution_path, encoding='utf-8') as f:
+            previous = json.load(f)
+        
+        current = self.snapshot()
+        changed = {}
+        for table in self.TABLES:
+            before = previous['tables'].get(table, {})
+            changed[table] = {name for name, row in current[table].items() if before.get(name) != row}
+            changed[table] |= set(before) - set(current[table])
+        
+        names = {'courses': self.data.course_names, 'rooms': self.data.room_names,
+                 'teachers': self.data.teacher_names}
+        ids = {table: {name: idx for idx, name in enumerate(names[table])} for table in self.TABLES}
+        self.hint, self.fixed = [], []
+        for a in previous['assignments']:
+            key = (ids['courses'].get(a['course']), ids['teachers'].get(a['teacher']),
+                   ids['rooms'].get(a['room']), a['day'], self.start_slot(a))
+            if None in key:
+                continue
+            # Hints keep the concrete room (assign_rooms prefers it); the
+            # model's variables are keyed by room class
+            self.hint.append(key)
+            if (fix_untouched and a['course'] not in changed['courses'] and
+                a['teacher'] not in changed['teachers'] and a['room'] not in changed['rooms']):
+                self.fixed.append(key)
+        return changed
+    
+    def released_fixed(self):
+        # The fixed keys that can't block a course left free: no candidate of
+        # a free course overlaps them with the same teacher or mandatory
+        # cohort, or in a slot where the fixed courses fill their room class
+        fixed_courses = {key[0] for key in self.fixed}
+        wanted = {}  # (teacher / year / room class, day) -> slots free courses may use
+        for course_idx, teacher_idx, room_idx, day, start in self.presolve():
+            if course_idx in fixed_courses:
+                continue
+            footprint = self.grid.footprint(start, self.course_slots[course_idx])
+            resources = [('teacher', teacher_idx), ('room', room_idx)]
+            if self.is_elective[course_idx] == 0:
+                resources.append(('year', self.course_years[course_idx]))
+            for resource in resources:
+                wanted[resource + (day,)] = wanted.get(resource + (day,), 0) | footprint
+        
+        used = {}  # (room class, day, slot) -> fixed courses in it
+        for course_idx, _, room_idx, day, start in self.fixed:
+            for slot in range(start, start + self.course_slots[course_idx]):
+                room_class = self.data.room_class[room_idx]
+                used[(room_class, day, slot)] = used.get((room_class, day, slot), 0) + 1
+        
+        kept = []
+        for course_idx, teacher_idx, room_idx, day, start in self.fixed:
+            footprint = self.grid.footprint(start, self.course_slots[course_idx])
+            room_class = self.data.room_class[room_idx]
+            full = sum(1 << slot for slot in range(start, start + self.course_slots[course_idx])
+                       if used[(room_class, day, slot)] >= len(self.data.class_rooms[room_class]))
+            blocking = (footprint & wanted.get(('teacher', teacher_idx, day), 0) or
+                        full & wanted.get(('room', room_class, day), 0) or
+                        self.is_elective[course_idx] == 0 and
+                        footprint & wanted.get(('year', self.course_years[course_idx], day), 0))
+            if not blocking:
+                kept.append((course_idx, teacher_idx, room_idx, day, start))
+        return kept
+    
+    def start_slot(self, assignment):
+        # Start slot of a saved assignment: a clock time, or the start hour
+        # files written before the time grid hold; None if it is not a slot
+        # of the current grid
+        start = assignment.get('start')
+        if start is None:
+            start = f"{assignment['start_time']:02d}:00"
+        try:
+            return self.grid.slot_at(start)
+        except ValueError:
+            return None
+    
+    def solve(self, backend=None, incremental=False, fix_untouched=False, explain_conflict=False):
+        backend = backend or MipBackend()
         
-        if status == pywraplp.Solver.OPTIMAL:
-            self.print_solution()
-            print(f"\nObjective value (Total preference score): {solver.Objective().Value()}")
-            return True
+        # Quick checks on the data; any issue found makes the model
+        # infeasible, so don't build it
+        with self.report.phase('diagnose'):
+            issues = diagnose(self)
+        if issues:
+            print("The input cannot be scheduled:")
+            for issue in issues:
+                print(f"  {issue.message}")
+            return None
+        
+        if incremental:
+            changed = self.load_previous(fix_untouched)
+            if changed is None:
+                print("No previous run found, solving from scratch.")
+            else:
+                edits = sum(len(names) for names in changed.values())
+                print(f"Incremental: {edits} changed rows, hinting {len(self.hint)} "
+                      f"and fixing {len(self.fixed)} assignments")
+        solution = backend.solve(self)
+        # Fixed assignments can make an edit infeasible that a cold solve
+        # schedules: release the ones next to the edited courses, then keep
+        # the previous run as a hint only
+        for stage in ('releasing the fixed assignments next to the edits',
+                      'keeping the previous run as a hint only'):
+            if solution.status != 'INFEASIBLE' or not self.fixed or backend.cancelled:
+                break
+            fixed = self.released_fixed() if stage.startswith('releasing') else []
+            if len(fixed) == len(self.fixed):
+                continue
+            print(f"Infeasible with {len(self.fixed)} fixed assignments, {stage} "
+                  f"({len(fixed)} fixed)")
+            self.fixed = fixed
+            solution = backend.solve(self)
+        removed = ', '.join(f"{rule}: {count}" for rule, count in self.presolve_stats.items())
+        print(f"Presolve kept {len(self.candidates)} assignments (removed {removed})")
+        
+        if solution.found:
+            with self.report.phase('schedule'):
+                schedule = Schedule(self, solution)
+            with self.report.phase('print_solution'):
+                print(schedule.text())
+            print(f"\nObjective value (Total preference score): {solution.objective}")
+            print(f"Status: {solution.status}, bound: {solution.bound}, gap: {solution.gap:.2%}")
+            print(f"Solved with {solution.backend} in {solution.wall_time:.2f}s")
+            if self.solution_path:
+                self.save_solution(solution)
+            return schedule
         else:
-            print("No solution found.")
-            return False
-    
-    def print_solution(self):
-        for key, var in self.x.items():
-            if var.solution_value() > 0.5:
-                course_idx, teacher_idx, room_idx, day, start_time = key
-                course = self.courses_df.iloc[course_idx]
-                teacher = self.teachers_df.iloc[teacher_idx]
-                room = self.rooms_df.iloc[room_idx]
-                
-                # Get preference value for this assignment
-                preferences = eval(teacher['preferences'])
-                course_hours = course['hours']
-                pref_value = 0
-                for h in range(course_hours):
-                    current_time = start_time + h
-                    if current_time != 12:  # Skip noon break hour
-                        adjusted_time = current_time if current_time < 12 else current_time - 1
-                        if adjusted_time - 9 < len(preferences[day]):
-                            pref_value += preferences[day][adjusted_time - 9]
-                
-                print(f"Course: {course['name']}")
-                print(f"Teacher: {teacher['name']}")
-                print(f"Room: {room['name']}")
-                print(f"Day: {day + 1}")
-                print(f"Time: {start_time}:00 - {start_time + course['hours']}:00")
-                print(f"Preference Score: {pref_value}")
-                print("-------------------")
+            print(f"No solution found ({solution.status}).")
+            if explain_conflict and solution.status == 'INFEASIBLE':
+                print_explanation(explain(self))
+            return None
+
+def make_backend(args):
+    limits = dict(time_limit=args.time_limit, relative_gap=args.gap, incumbent_path=args.incumbents)
+    if args.lns:
+        from lns import LnsBackend  # lns builds on CourseScheduler
+        
+        backend = LnsBackend(seed=args.seed, step_limit=args.lns_step, max_workers=args.processes, **limits)
+        backend.on_incumbent = lambda objective, bound: print(
+            f"LNS {backend.history[-1]['elapsed']:7.2f}s  round {backend.history[-1]['round']:4d}  "
+            f"objective {objective:.0f}  ({', '.join(backend.history[-1]['neighbourhoods'])})")
+        return backend
+    if args.backend == CpSatBackend.name:
+        backend = CpSatBackend(num_search_workers=args.workers, **limits)
+    elif args.backend == MipBackend.name and args.cache:
+        backend = MipBackend(cache=ModelCache(args.cache_dir), **limits)
+    else:
+        backend = BACKENDS[args.backend](**limits)
+    if args.partition:
+        return PartitionedBackend(backend, max_workers=args.processes)
+    return backend
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Weekly course scheduler")
+    parser.add_argument('--data-dir', default='.',
+                        help="directory holding courses.csv, rooms.csv and teachers.csv")
+    parser.add_argument('--sqlite', metavar='PATH',
+                        help="read the input tables from an SQLite database instead")
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        help=f"solver backend (default: {MipBackend.name}, or {CpSatBackend.name} "
+                             f"with --incumbents)")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="CP-SAT search workers (default: %(default)s)")
+    parser.add_argument('--partition', action='store_true',
+                        help="solve independent groups of courses separately in a process pool")
+    parser.add_argument('--processes', type=int,
+                        help="worker processes for --partition (default: CPU count) or --lns (default: 1)")
+    parser.add_argument('--lns', action='store_true',
+                        help="large neighbourhood search from a greedy schedule instead of one exact "
+                             "solve; --time-limit bounds the whole search")
+    parser.add_argument('--lns-step', type=float, default=5.0,
+                        help="time limit of every --lns sub-solve in seconds (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="random seed of --lns (default: %(default)s)")
+    parser.add_argument('--time-limit', type=float,
+                        help="wall-clock limit for the solver in seconds")
+    parser.add_argument('--gap', type=float,
+                        help="stop at this relative gap, e.g. 0.01")
+    parser.add_argument('--incumbents', metavar='PATH',
+                        help=f"append every improving incumbent to PATH as JSON lines; needs a "
+                             f"backend that reports them during the search ({CpSatBackend.name} "
+                             f"or --lns)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="warm start from the last saved solution")
+    parser.add_argument('--fix-untouched', action='store_true',
+                        help="with --incremental, keep assignments the edits did not touch")
+    parser.add_argument('--cache', action='store_true',
+                        help="load the SCIP model from the model cache when the inputs are unchanged")
+    parser.add_argument('--cache-dir', default='.model_cache',
+                        help="model cache directory (default: %(default)s)")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="remove every cached model and exit")
+    parser.add_argument('--explain', action='store_true',
+                        help="if the model is infeasible, relax constraint families to locate the conflict")
+    parser.add_argument('--report', metavar='PATH',
+                        help="write timings, model sizes and solver statistics to PATH as JSON")
+    parser.add_argument('--export', metavar='PATH', action='append', default=[],
+                        help="write the schedule to PATH (.csv, .json or .ics); repeatable")
+    parser.add_argument('--grid', metavar='PATH',
+                        help="JSON time grid (days, start, end, slot_minutes, breaks); default: "
+                             "Monday to Friday, 9:00 to 17:00 in hourly slots, break at 12:00")
+    parser.add_argument('--week-start', type=datetime.date.fromisoformat,
+                        help="first week of the .ics calendar, YYYY-MM-DD (default: next Monday)")
+    args = parser.parse_args(argv)
+    if args.lns and args.partition:
+        parser.error("--lns and --partition cannot be combined")
+    # pywraplp has no incumbent callback, so its backends can't log the
+    # incumbents of a running search
+    if args.backend is None:
+        args.backend = CpSatBackend.name if args.incumbents and not args.lns else MipBackend.name
+    if args.incumbents and not args.lns and not BACKENDS[args.backend].streams_incumbents:
+        parser.error(f"--incumbents needs --backend {CpSatBackend.name} or --lns: the {args.backend} "
+                     f"backend only sees its final solution")
+    return args
 
 # Usage
 if __name__ == "__main__":
-    scheduler = CourseScheduler()
-    scheduler.solve()
+    sys.stdout.reconfigure(encoding='utf-8')
+    args = parse_args()
+    if args.clear_cache:
+        print(f"Removed {ModelCache(args.cache_dir).clear()} cached models")
+        sys.exit()
+    grid = TimeGrid.load(args.grid) if args.grid else None
+    scheduler = CourseScheduler(source=DataSource(args.data_dir, sqlite_path=args.sqlite), grid=grid)
+    schedule = scheduler.solve(make_backend(args), incremental=args.incremental,
+                               fix_untouched=args.fix_untouched, explain_conflict=args.explain)
+    if schedule is not None:
+        for path in args.export:
+            schedule.export(path, week_start=args.week_start)
+    if args.report:
+        scheduler.report.write_json(args.report)
@@ -0,0 +1,62 @@
+import json
+import time
+from contextlib import contextmanager
+
+
+class RunReport:
+    # Timings and model-size counters collected during a run. Recording is a
+    # perf_counter call per phase and a couple of integer updates per
+    # constraint family, so it stays on in production runs.
+    def __init__(self):
+        self.phases = {}    # phase -> seconds, accumulated over calls
+        self.families = {}  # family -> {'variables': n, 'constraints': n}
+        self.solver = {}    # backend statistics (status, nodes, iterations, ...)
+        self.listener = None  # called with the name of every phase as it starts
+
+    @contextmanager
+    def phase(self, name):
+        if self.listener is not None:
+            self.listener(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def family(self, name, solver):
+        # Time a pywraplp constraint family and count the rows it adds
+        before = solver.NumConstraints()
+        with self.phase(name):
+            yield
+        self.count(name, constraints=solver.NumConstraints() - before)
+
+    def count(self, family, variables=0, constraints=0):
+        counts = self.families.setdefault(family, {'variables': 0, 'constraints': 0})
+        counts['variables'] += variables
+        counts['constraints'] += constraints
+
+    @property
+    def variables(self):
+        return sum(counts['variables'] for counts in self.families.values())
+
+    @property
+    def constraints(self):
+        return sum(counts['constraints'] for counts in self.families.values())
+
+    def to_dict(self):
+        return {
+            'phases': self.phases,
+            'families': self.families,
+            'variables': self.variables,
+            'constraints': self.constraints,
+            'solver': self.solver,
+        }
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        phases = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        return f"{self.variables} variables, {self.constraints} constraints; {phases}"
@@ -0,0 +1,229 @@
+import argparse
+import copy
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cozucu import BACKENDS, MipBackend, Solution
+from proje import CourseScheduler
+from rapor import RunReport
+from tani import diagnose
+from veri import DataSource
+from zaman import TimeGrid
+
+# Declarative what-if patches, as they appear in a scenario file:
+#   {"close_room": "D010"}                      room is out of use all week
+#   {"drop_teacher": "Ali Can Karaca"}          teacher is not available at all
+#   {"part_time": "Ali Can Karaca", "days": [1, 3]}  teacher only comes on these days (1 = Monday)
+#   {"grow_cohort": 2, "students": 15}         every mandatory course of year 2 gains 15 students
+# Every patch only takes options away, so the candidates of a scenario are a
+# subset of the base candidates and presolve never has to run again.
+PATCHES = ('close_room', 'drop_teacher', 'part_time', 'grow_cohort')
+
+
+def parse_patch(patch, data):
+    # Resolve the names of one patch to indices: (kind, target, value)
+    kinds = [kind for kind in PATCHES if kind in patch]
+    if len(kinds) != 1:
+        raise ValueError(f"Patch must have exactly one of {', '.join(PATCHES)}: {patch}")
+    kind = kinds[0]
+    target = patch[kind]
+
+    if kind == 'close_room':
+        if target not in data.room_names:
+            raise ValueError(f"Unknown room {target!r}")
+        return kind, data.room_names.index(target), None
+    if kind == 'grow_cohort':
+        if int(target) not in data.course_years.tolist():
+            raise ValueError(f"No courses in year {target!r}")
+        return kind, int(target), int(patch.get('students', 0))
+
+    if target not in data.teacher_names:
+        raise ValueError(f"Unknown teacher {target!r}")
+    teacher_idx = data.teacher_names.index(target)
+    if kind == 'drop_teacher':
+        return kind, teacher_idx, None
+    days = [int(day) - 1 for day in patch.get('days', [])]
+    if any(day not in range(len(data.availability[teacher_idx])) for day in days):
+        raise ValueError(f"Invalid days for teacher {target!r}: {patch.get('days')}")
+    return kind, teacher_idx, days
+
+
+def load_scenarios(path, data):
+    # A scenario file is a JSON list of {"name": ..., "patches": [...]}
+    with open(path, encoding='utf-8') as f:
+        scenarios = json.load(f)
+    parsed = []
+    for idx, scenario in enumerate(scenarios):
+        name = scenario.get('name') or f'scenario {idx + 1}'
+        try:
+            patches = [parse_patch(patch, data) for patch in scenario.get('patches', [])]
+        except ValueError as e:
+            raise ValueError(f"{name}: {e}")
+        parsed.append((name, patches))
+    return parsed
+
+
+class ScenarioScheduler(CourseScheduler):
+    # The base scheduler with one scenario's patches applied. The parsed
+    # arrays and presolved candidates of the base run are reused: patches
+    # edit copies of the affected arrays and mask the candidate keys, and
+    # nothing is read or parsed again.
+    def __init__(self, base, keys, patches):
+        self.__dict__.update(base.__dict__)
+        self.report = RunReport()
+        self.solution_path = None
+        self.hint = []
+        self.fixed = []
+        with self.report.phase('patch'):
+            self.apply(keys, patches)
+
+    def apply(self, keys, patches):
+        data = copy.copy(self.data)
+        data.availability = data.availability.copy()
+        data.preferences = data.preferences.copy()
+        data.course_students = data.course_students.copy()
+        data.course_teachers = list(data.course_teachers)
+        data.course_rooms = list(data.course_rooms)
+        data.course_classes = list(data.course_classes)
+        data.class_rooms = dict(data.class_rooms)
+        keep = np.ones(len(keys), dtype=bool)
+
+        for kind, target, value in patches:
+            if kind == 'close_room':
+                # Keys name room classes: the class loses a room, and its
+                # candidates go only once no room is left
+                room_class = data.room_class[target]
+                data.class_rooms[room_class] = tuple(r for r in data.class_rooms[room_class] if r != target)
+                if not data.class_rooms[room_class]:
+                    keep &= keys[:, 2] != room_class
+                    data.course_classes = [tuple(r for r in classes if r != room_class)
+                                           for classes in data.course_classes]
+                data.course_rooms = [tuple(r for r in rooms if r != target) for rooms in data.course_rooms]
+            elif kind == 'drop_teacher':
+                keep &= keys[:, 1] != target
+                data.availability[target] = 0
+                data.preferences[target] = 0
+                data.course_teachers = [tuple(t for t in teachers if t != target)
+                                        for teachers in data.course_teachers]
+            elif kind == 'part_time':
+                off = [day for day in self.days if day not in value]
+                keep &= ~((keys[:, 1] == target) & np.isin(keys[:, 3], off))
+                data.availability[target, off] = 0
+                data.preferences[target, off] = 0
+            elif kind == 'grow_cohort':
+                grown = (data.course_years == target) & (data.is_elective == 0)
+                data.course_students[grown] += value
+                keep &= data.room_capacities[keys[:, 2]] >= data.course_students[keys[:, 0]]
+                for course_idx in np.flatnonzero(grown).tolist():
+                    fits = lambda r: data.room_capacities[r] >= data.course_students[course_idx]
+                    data.course_rooms[course_idx] = tuple(filter(fits, data.course_rooms[course_idx]))
+                    data.course_classes[course_idx] = tuple(filter(fits, data.course_classes[course_idx]))
+
+        self.data = data
+        self.course_students = data.course_students.tolist()
+        self.availability = data.availability
+        self.preferences = data.preferences
+        # The slot bitmasks diagnose reads (see CourseScheduler.preprocess)
+        self.available_masks = self.grid.masks(data.availability).tolist()
+        self.start_masks = self.grid.masks(data.preferences).tolist()
+        self.candidates = [tuple(key) for key in keys[keep].tolist()]
+        self.presolve_stats = dict(self.presolve_stats, scenario=int(len(keys) - keep.sum()))
+
+    def presolve(self):
+        # Already done on the base data and narrowed down in apply()
+        return self.candidates
+
+
+# Set in every worker process by init_worker, so the base scheduler is
+# pickled once per worker rather than once per scenario
+_base = None
+
+
+def init_worker(base, keys):
+    global _base
+    _base = (base, keys)
+
+
+def run_scenario(name, patches, backend):
+    base, keys = _base
+    start = time.time()
+    scheduler = ScenarioScheduler(base, keys, patches)
+    # Scenarios the quick checks rule out are not solved
+    issues = [issue.message for issue in diagnose(scheduler)]
+    solution = Solution(backend.name, 'INFEASIBLE') if issues else backend.solve(scheduler)
+    return {
+        'scenario': name,
+        'status': solution.status,
+        'feasible': solution.found,
+        'objective': solution.objective,
+        'bound': solution.bound,
+        'candidates': len(scheduler.candidates),
+        'solve_time': time.time() - start,
+        'issues': issues,
+    }
+
+
+def run(base, scenarios, backend=None, max_workers=None):
+    # Solve the base data and every (name, patches) scenario in a process
+    # pool; returns one result row per scenario, the base first
+    backend = backend or MipBackend()
+    with base.report.phase('presolve'):
+        keys = np.array(base.presolve(), dtype=np.int32).reshape(-1, 5)
+    scenarios = [('base', [])] + list(scenarios)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                             initargs=(base, keys)) as pool:
+        futures = [pool.submit(run_scenario, name, patches, backend) for name, patches in scenarios]
+        results = [future.result() for future in futures]
+
+    base_objective = results[0]['objective']
+    for result in results:
+        result['delta'] = (result['objective'] - base_objective
+                           if result['feasible'] and base_objective is not None else None)
+    return results
+
+
+def format_table(results):
+    width = max(len('scenario'), *(len(result['scenario']) for result in results))
+    lines = [f"{'scenario':<{width}}  {'status':<10}  {'objective':>9}  {'delta':>7}  "
+             f"{'candidates':>10}  {'time':>7}"]
+    for result in results:
+        objective = f"{result['objective']:.0f}" if result['feasible'] else '-'
+        delta = f"{result['delta']:+.0f}" if result['delta'] is not None else '-'
+        lines.append(f"{result['scenario']:<{width}}  {result['status']:<10}  {objective:>9}  "
+                     f"{delta:>7}  {result['candidates']:>10}  {result['solve_time']:6.2f}s")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Solve what-if scenarios against the base data")
+    parser.add_argument('scenarios', help="JSON list of {\"name\": ..., \"patches\": [...]}")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--sqlite', metavar='PATH',
+                        help="read the base tables from an SQLite database instead")
+    parser.add_argument('--grid', metavar='PATH', help="JSON time grid (see zaman.TimeGrid.load)")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default=MipBackend.name)
+    parser.add_argument('--processes', type=int,
+                        help="scenarios solved at once (default: CPU count)")
+    parser.add_argument('--time-limit', type=float, help="per scenario, in seconds")
+    parser.add_argument('--gap', type=float, help="stop each scenario at this relative gap")
+    parser.add_argument('--out', metavar='PATH', help="also write the results to PATH as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    base = CourseScheduler(solution_path=None, source=DataSource(args.data_dir, sqlite_path=args.sqlite),
+                           grid=TimeGrid.load(args.grid) if args.grid else None)
+    scenarios = load_scenarios(args.scenarios, base.data)
+    backend = BACKENDS[args.backend](time_limit=args.time_limit, relative_gap=args.gap)
+    results = run(base, scenarios, backend, args.processes)
+    print(format_table(results))
+    for result in results:
+        for issue in result['issues']:
+            print(f"{result['scenario']}: {issue}")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,464 @@
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.managers import SyncManager
+
+import pandas as pd
+from ortools.linear_solver import pywraplp
+
+from cizelge import Schedule
+from cozucu import BACKENDS, CpSatBackend, MipBackend, Solution
+from proje import CourseScheduler
+from tani import diagnose
+from veri import TABLES
+from zaman import TimeGrid
+
+# Local HTTP/JSON front end to CourseScheduler. Jobs are solved in a fixed
+# pool of worker processes that import pandas and OR-Tools once at start,
+# so a request pays for the solve only. Endpoints:
+#   POST /jobs                 submit a job, returns {"id": ..., "status": ...}
+#   GET  /jobs                 every known job, without results
+#   GET  /jobs/<id>[?wait=s]   status, progress and, once finished, the result;
+#                              with wait, block up to s seconds for the result
+#   POST /jobs/<id>/cancel     cancel a queued or running job
+#   GET  /health               pool and cache counters
+# A job payload is
+#   {"tables": {"courses": ..., "rooms": ..., "teachers": ...},
+#    "backend": "scip", "time_limit": 30, "gap": 0.01, "workers": 8,
+#    "grid": {"days": 5, "start": "09:00", ...}}
+# where each table is a list of row objects (availability and preferences
+# may be nested lists) or the text of its CSV file. Everything but tables
+# is optional. Results are cached by the hash of the tables and options.
+
+MAX_BODY = 64 * 1024 * 1024
+MATRIX_COLUMNS = ('availability', 'preferences')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def read_payload_table(table, value):
+    # One table of a job payload as the DataFrame CourseScheduler reads
+    if isinstance(value, str):
+        return pd.read_csv(io.StringIO(value))
+    if not isinstance(value, list) or not all(isinstance(row, dict) for row in value):
+        raise ValueError(f"Table {table!r} must be a list of row objects or CSV text")
+    df = pd.DataFrame.from_records(value)
+    for column in MATRIX_COLUMNS:
+        if column in df:
+            df[column] = [row if isinstance(row, str) else json.dumps(row, separators=(',', ':'))
+                          for row in df[column]]
+    return df
+
+
+def parse_job(payload, default_time_limit=None):
+    # Validate a job payload; returns (tables, grid, options)
+    if not isinstance(payload, dict) or not isinstance(payload.get('tables'), dict):
+        raise ValueError("Job must be a JSON object with a 'tables' object")
+    missing = [table for table in TABLES if table not in payload['tables']]
+    if missing:
+        raise ValueError(f"Missing tables: {', '.join(missing)}")
+    tables = {table: read_payload_table(table, payload['tables'][table]) for table in TABLES}
+
+    grid = TimeGrid(**payload['grid']) if payload.get('grid') else TimeGrid()
+    options = {
+        'backend': payload.get('backend', MipBackend.name),
+        'time_limit': payload.get('time_limit', default_time_limit),
+        'gap': payload.get('gap'),
+        'workers': payload.get('workers'),
+    }
+    if options['backend'] not in BACKENDS:
+        raise ValueError(f"Unknown backend {options['backend']!r}: use one of {', '.join(sorted(BACKENDS))}")
+    for name in ('time_limit', 'gap', 'workers'):
+        if options[name] is not None and (isinstance(options[name], bool) or
+                                          not isinstance(options[name], (int, float)) or options[name] <= 0):
+            raise ValueError(f"{name} must be a positive number")
+    return tables, grid, options
+
+
+def job_key(tables, grid, options):
+    # Same inputs and options, same result: hash of the tables as CSV (as
+    # onbellek.ModelCache does), the grid and the options
+    digest = hashlib.sha256(json.dumps([grid.to_dict(), options], sort_keys=True).encode('utf-8'))
+    for table in TABLES:
+        digest.update(tables[table].to_csv(index=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def make_backend(options):
+    limits = dict(time_limit=options['time_limit'], relative_gap=options['gap'])
+    if options['backend'] == CpSatBackend.name and options['workers']:
+        return CpSatBackend(num_search_workers=int(options['workers']), **limits)
+    return BACKENDS[options['backend']](**limits)
+
+
+# Set in every worker process by init_worker: shared {job id: True} of
+# cancelled jobs and {job id: progress} the service reads for job status
+_cancelled = None
+_progress = None
+
+
+def ignore_interrupt():
+    # Ctrl-C is for the service process, which cancels the jobs and stops
+    # the workers and the manager itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def init_worker(cancelled, progress):
+    global _cancelled, _progress
+    ignore_interrupt()
+    _cancelled, _progress = cancelled, progress
+    # Load the solver libraries before the first job arrives
+    pywraplp.Solver.CreateSolver('SCIP')
+
+
+def warm_up():
+    return True
+
+
+def run_job(job_id, tables, grid, options):
+    # Runs in a worker process. A watcher thread turns a cancellation posted
+    # by the service into Backend.cancel(), or aborts the model build at the
+    # next phase.
+    backend = make_backend(options)
+    progress = {'phase': 'preprocess', 'objective': None, 'bound': None, 'started': time.time()}
+    _progress[job_id] = progress
+    finished = threading.Event()
+    cancelled = threading.Event()
+
+    def watch():
+        # Also catches a job cancelled while it sat in the pool's call queue
+        while True:
+            if _cancelled.get(job_id):
+                cancelled.set()
+                backend.cancel()
+                return
+            if finished.wait(0.2):
+                return
+
+    def on_phase(name):
+        if cancelled.is_set():
+            raise JobCancelled()
+        progress['phase'] = name
+        _progress[job_id] = progress
+
+    def on_incumbent(objective, bound):
+        progress.update(objective=objective, bound=bound)
+        _progress[job_id] = progress
+
+    threading.Thread(target=watch, daemon=True).start()
+    try:
+        scheduler = CourseScheduler(solution_path=None, tables=tables, grid=grid)
+        scheduler.report.listener = on_phase
+        backend.on_incumbent = on_incumbent
+        # Inputs the quick checks rule out are not solved
+        with scheduler.report.phase('diagnose'):
+            issues = [issue.message for issue in diagnose(scheduler)]
+        solution = Solution(backend.name, 'INFEASIBLE') if issues else backend.solve(scheduler)
+        if solution.found:
+            with scheduler.report.phase('schedule'):
+                result = Schedule(scheduler, solution).to_dict()
+        else:
+            result = {'status': solution.status, 'objective': None, 'bound': None,
+                      'backend': solution.backend, 'wall_time': solution.wall_time, 'assignments': []}
+        result.update(
+            issues=issues,
+            candidates=len(getattr(scheduler, 'candidates', [])),
+            presolve=getattr(scheduler, 'presolve_stats', {}),
+            report=scheduler.report.to_dict(),
+        )
+        return cancelled.is_set(), result
+    except JobCancelled:
+        return True, None
+    finally:
+        finished.set()
+
+
+class Job:
+    # One submitted job as the service tracks it. status is 'queued',
+    # 'running', 'done', 'cancelled' or 'error'; the solver's own status is
+    # in the result.
+    def __init__(self, key, options):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.options = options
+        self.status = 'queued'
+        self.cached = False
+        self.submitted = time.time()
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.future = None
+        self.done = threading.Event()
+
+    def finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        self.done.set()
+
+    def to_dict(self, progress=None, result=True):
+        job = {
+            'id': self.id,
+            'status': self.status,
+            'cached': self.cached,
+            'options': self.options,
+            'submitted': self.submitted,
+            'finished': self.finished,
+        }
+        if progress is not None:
+            job['progress'] = progress
+        if self.error is not None:
+            job['error'] = self.error
+        if result and self.result is not None:
+            job['result'] = self.result
+        return job
+
+
+class SchedulingService:
+    # Job table, result cache and worker pool behind the HTTP handler. At
+    # most max_queued jobs wait while every worker is busy; submitting a job
+    # identical to one that is queued or running returns that job.
+    def __init__(self, max_workers=None, max_queued=64, cache_size=256, max_jobs=4096,
+                 default_time_limit=None):
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.max_queued = max_queued
+        self.cache_size = cache_size
+        self.max_jobs = max_jobs
+        self.default_time_limit = default_time_limit
+
+        self.manager = SyncManager()
+        self.manager.start(ignore_interrupt)
+        self.cancelled = self.manager.dict()
+        self.progress = self.manager.dict()
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_worker,
+                                        initargs=(self.cancelled, self.progress))
+        # Start every worker now rather than on the first jobs
+        for future in [self.pool.submit(warm_up) for _ in range(self.max_workers)]:
+            future.result()
+
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()     # id -> Job, oldest first
+        self.results = OrderedDict()  # input hash -> result, least recently used first
+        self.pending = {}             # input hash -> queued or running Job
+
+    def submit(self, payload):
+        # Returns the Job; raises ValueError for a bad payload and
+        # OverflowError when the queue is full
+        tables, grid, options = parse_job(payload, self.default_time_limit)
+        key = job_key(tables, grid, options)
+        with self.lock:
+            if key in self.pending:
+                return self.pending[key]
+            job = Job(key, options)
+            if key in self.results:
+                self.results.move_to_end(key)
+                job.cached = True
+                job.finish('done', self.results[key])
+                self.add(job)
+                return job
+            if len(self.pending) >= self.max_queued + self.max_workers:
+                raise OverflowError(f"Queue is full ({self.max_queued} jobs waiting)")
+            self.add(job)
+            self.pending[key] = job
+            job.future = self.pool.submit(run_job, job.id, tables, grid, options)
+        job.future.add_done_callback(lambda future: self.finished(job, future))
+        return job
+
+    def add(self, job):
+        # Called with the lock held; forgets the oldest finished jobs
+        self.jobs[job.id] = job
+        for old in list(self.jobs.values()):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if old.done.is_set():
+                del self.jobs[old.id]
+
+    def finished(self, job, future):
+        if future.cancelled():
+            status, result, error = 'cancelled', None, None
+        elif future.exception() is not None:
+            status, result, error = 'error', None, f"{type(future.exception()).__name__}: {future.exception()}"
+        else:
+            was_cancelled, result = future.result()
+            status, error = ('cancelled' if was_cancelled else 'done'), None
+        with self.lock:
+            self.pending.pop(job.key, None)
+            if status == 'done':
+                self.results[job.key] = result
+                while len(self.results) > self.cache_size:
+                    self.results.popitem(last=False)
+            job.finish(status, result, error)
+        self.progress.pop(job.id, None)
+        self.cancelled.pop(job.id, None)
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def describe(self, job, result=True):
+        # A queued job is running once its worker has posted progress
+        progress = None
+        if not job.done.is_set():
+            progress = self.progress.get(job.id)
+            with self.lock:
+                if progress is not None and not job.done.is_set():
+                    job.status = 'running'
+        return job.to_dict(progress, result)
+
+    def cancel(self, job):
+        # A queued job is dropped; a running one stops at the next phase
+        # or interrupts its solver, keeping the best schedule found so far
+        if job.done.is_set():
+            return
+        if not job.future.cancel():
+            self.cancelled[job.id] = True
+
+    def health(self):
+        running = set(self.progress.keys())
+        with self.lock:
+            pending = [job.id for job in self.pending.values()]
+            counts = {'jobs': len(self.jobs), 'cached_results': len(self.results)}
+        return dict(workers=self.max_workers,
+                    queued=sum(job_id not in running for job_id in pending),
+                    running=sum(job_id in running for job_id in pending), **counts)
+
+    def shutdown(self):
+        with self.lock:
+            pending = list(self.pending.values())
+        for job in pending:
+            self.cancel(job)
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.manager.shutdown()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # self.server.service is the SchedulingService
+    server_version = 'proje/1'
+
+    def send_json(self, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, code, message):
+        self.send_json(code, {'error': message})
+
+    def route(self):
+        # (path parts, query) of the request
+        path, _, query = self.path.partition('?')
+        params = dict(item.partition('=')[::2] for item in query.split('&') if item)
+        return [part for part in path.split('/') if part], params
+
+    def job_or_404(self, job_id):
+        job = self.server.service.get(job_id)
+        if job is None:
+            self.send_error_json(404, f"No job {job_id!r}")
+        return job
+
+    def do_GET(self):
+        service = self.server.service
+        parts, params = self.route()
+        if parts == ['health']:
+            self.send_json(200, service.health())
+        elif parts == ['jobs']:
+            with service.lock:
+                jobs = list(service.jobs.values())
+            self.send_json(200, [service.describe(job, result=False) for job in jobs])
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self.job_or_404(parts[1])
+            if job is None:
+                return
+            try:
+                wait = float(params.get('wait', 0))
+            except ValueError:
+                self.send_error_json(400, "wait must be a number of seconds")
+                return
+            if wait > 0:
+                job.done.wait(wait)
+            self.send_json(200, service.describe(job))
+        else:
+            self.send_error_json(404, f"No route {self.path!r}")
+
+    def do_POST(self):
+        service = self.server.service
+        parts, _ = self.route()
+        if parts == ['jobs']:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY:
+                self.send_error_json(413, f"Request body over {MAX_BODY} bytes")
+                return
+            try:
+                job = service.submit(json.loads(self.rfile.read(length) or b'null'))
+            except OverflowError as e:
+                self.send_error_json(503, str(e))
+                return
+            except (ValueError, TypeError, KeyError) as e:
+                self.send_error_json(400, str(e))
+                return
+            self.send_json(200 if job.done.is_set() else 202, service.describe(job))
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+            job = self.job_or_404(parts[1])
+            if job is None:
+                return
+            service.cancel(job)
+            self.send_json(200, service.describe(job, result=False))
+        else:
+            self.send_error_json(404, f"No route {self.path!r}")
+
+
+def stop(signum, frame):
+    raise KeyboardInterrupt()
+
+
+def serve(host='127.0.0.1', port=8750, **options):
+    # Run the service until interrupted or terminated
+    signal.signal(signal.SIGTERM, stop)
+    service = SchedulingService(**options)
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    print(f"Serving on http://{host}:{server.server_address[1]} with {service.max_workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON scheduling service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8750)
+    parser.add_argument('--processes', type=int,
+                        help="worker processes solving jobs (default: CPU count)")
+    parser.add_argument('--max-queued', type=int, default=64,
+                        help="jobs that may wait for a worker before submissions are refused "
+                             "(default: %(default)s)")
+    parser.add_argument('--cache-size', type=int, default=256,
+                        help="results kept by input hash (default: %(default)s)")
+    parser.add_argument('--time-limit', type=float,
+                        help="time limit of jobs that do not set one, in seconds")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    serve(args.host, args.port, max_workers=args.processes, max_queued=args.max_queued,
+          cache_size=args.cache_size, default_time_limit=args.time_limit)
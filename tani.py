@@ -0,0 +1,245 @@
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+from cozucu import MIP_STATUS, milliseconds
+from veri import DataSource
+
+# One reason the input cannot be scheduled. Every check below is a
+# necessary condition of the model, so any issue means it is infeasible.
+Issue = namedtuple('Issue', 'kind subject message')
+
+
+def diagnose(scheduler):
+    # Cheap feasibility checks over the parsed arrays, run before any model
+    # is built. Returns a list of Issue, empty when nothing was found.
+    data = scheduler.data
+    courses = scheduler.courses_df
+    grid = scheduler.grid
+    issues = []
+    # Teaching slots of the week, and the same as a length for messages
+    week = grid.days * grid.teaching_slots
+    hours = lambda slots: f"{grid.hours(slots):g} hours"
+
+    # Courses whose possible_teachers names no row of teachers.csv, or only
+    # teachers a scenario dropped (see senaryo.ScenarioScheduler)
+    for course_idx, teachers in enumerate(data.course_teachers):
+        if not teachers:
+            names = str(courses['possible_teachers'].iloc[course_idx])
+            dropped = [name for name in names.split(';') if name in data.teacher_names]
+            reason = (f"its teachers {', '.join(dropped)} were dropped" if len(dropped) > 1 else
+                      f"its only teacher {dropped[0]} was dropped" if dropped else
+                      f"no teacher of {names!r} is in the teachers table")
+            issues.append(Issue('no_teacher', data.course_names[course_idx],
+                                f"Course {data.course_names[course_idx]!r}: {reason}"))
+
+    # Courses no room can host
+    largest = int(data.room_capacities.max()) if len(data.room_capacities) else 0
+    for course_idx, rooms in enumerate(data.course_rooms):
+        if not rooms:
+            students = int(data.course_students[course_idx])
+            reason = (f"{students} students, largest room holds {largest}" if students > largest
+                      else "no room of its department is large enough")
+            issues.append(Issue('no_room', data.course_names[course_idx],
+                                f"Course {data.course_names[course_idx]!r}: {reason}"))
+
+    # Courses with an eligible teacher but no start time that teacher can
+    # take (availability, breaks, zero-rated start)
+    windows = start_windows(scheduler)
+    course_slots = np.array(scheduler.course_slots, dtype=np.int64)
+    for course_idx, teachers in enumerate(data.course_teachers):
+        length = scheduler.course_slots[course_idx]
+        if teachers and not windows[length][list(teachers)].any():
+            issues.append(Issue('no_slot', data.course_names[course_idx],
+                                f"Course {data.course_names[course_idx]!r}: none of its teachers "
+                                f"has {hours(length)} in a row available"))
+
+    # Teachers with less available time than the courses only they can teach
+    teaching = np.array([bool(grid.teaching_mask >> slot & 1) for slot in range(grid.slots)])
+    available = data.availability[:, :, teaching].sum(axis=(1, 2))
+    forced = np.zeros(len(data.teacher_names), dtype=np.int64)
+    for course_idx, teachers in enumerate(data.course_teachers):
+        if len(teachers) == 1:
+            forced[teachers[0]] += course_slots[course_idx]
+    for teacher_idx in np.flatnonzero(forced > available).tolist():
+        issues.append(Issue('teacher_load', data.teacher_names[teacher_idx],
+                            f"Teacher {data.teacher_names[teacher_idx]!r}: {hours(forced[teacher_idx])} "
+                            f"of courses only they teach, {hours(available[teacher_idx])} available"))
+
+    # Cohorts whose mandatory courses do not fit in the week
+    mandatory = data.is_elective == 0
+    for year in np.unique(data.course_years[mandatory]).tolist():
+        needed = int(course_slots[mandatory & (data.course_years == year)].sum())
+        if needed > week:
+            issues.append(Issue('cohort_load', year,
+                                f"Year {year}: {hours(needed)} of mandatory courses, "
+                                f"the week has {hours(week)}"))
+
+    # Rooms: the courses that can only use rooms of a set S need at most
+    # |S| rooms' worth of weekly slots
+    room_sets = {rooms for rooms in data.course_rooms if rooms}
+    for rooms in room_sets:
+        allowed = set(rooms)
+        needed = sum(scheduler.course_slots[c] for c, own in enumerate(data.course_rooms)
+                     if own and allowed.issuperset(own))
+        if needed > len(rooms) * week:
+            names = ', '.join(data.room_names[r] for r in rooms)
+            issues.append(Issue('room_load', names,
+                                f"Rooms {names}: {hours(needed)} of courses fit only there, "
+                                f"{hours(len(rooms) * week)} of room time available"))
+    return issues
+
+
+def start_windows(scheduler):
+    # {slots: (teachers x days) bool}: the teacher can start a course of that
+    # length on that day under the presolve rules
+    grid = scheduler.grid
+    available = np.array(scheduler.available_masks, dtype=np.uint64)
+    startable = np.array(scheduler.start_masks, dtype=np.uint64)
+    windows = {}
+    for length in set(scheduler.course_slots):
+        ok = np.zeros(available.shape, dtype=bool)
+        for start, footprint in grid.starts(length):
+            if footprint & grid.break_mask:
+                continue
+            footprint = np.uint64(footprint)
+            ok |= (((available & footprint) == footprint) &
+                   ((startable >> np.uint64(start)) & np.uint64(1)).astype(bool))
+        windows[length] = ok
+    return windows
+
+
+# Constraint families explain() may relax, and how to name one of their rows
+RELAXABLE = {
+    'add_course_assignment_constraints': lambda s, course: f"course {s.data.course_names[course]!r} unscheduled",
+    'add_teacher_constraints': lambda s, key: f"teacher {s.data.teacher_names[key[0]]!r} double-booked "
+                                              f"{s.grid.day_names[key[1]]} {s.grid.label(key[2])}",
+    'add_room_constraints': lambda s, key: f"rooms {', '.join(s.data.room_names[r] for r in s.data.class_rooms[key[0]])} "
+                                           f"overbooked {s.grid.day_names[key[1]]} {s.grid.label(key[2])}",
+    'add_mandatory_course_constraints': lambda s, key: f"year {key[0]} mandatory courses overlap "
+                                                       f"{s.grid.day_names[key[1]]} {s.grid.label(key[2])}",
+    'fixed_assignments': lambda s, key: f"course {s.data.course_names[key[0]]!r} fixed to "
+                                        f"{s.data.teacher_names[key[1]]!r} {s.grid.day_names[key[3]]} "
+                                        f"{s.grid.label(key[4])}",
+}
+
+
+def row_keys(scheduler):
+    # What each row of a family constrains, in the order the add_*
+    # methods of CourseScheduler emit them
+    multiple = lambda index: [key for key, time_vars in index.items() if len(time_vars) > 1]
+    rooms = lambda key: len(scheduler.data.class_rooms[key[0]])
+    return {
+        'add_course_assignment_constraints': list(range(len(scheduler.course_hours))),
+        'add_teacher_constraints': multiple(scheduler.teacher_index),
+        'add_room_constraints': [key for key, time_vars in scheduler.room_index.items()
+                                 if len(time_vars) > rooms(key)],
+        'add_mandatory_course_constraints': multiple(scheduler.year_index),
+        # Fixed keys without a variable were presolved away and fix nothing
+        'fixed_assignments': [key for key in dict.fromkeys(scheduler.class_keys(scheduler.fixed))
+                              if key in scheduler.x],
+    }
+
+
+def explain(scheduler, solver_id='SCIP', time_limit=60):
+    # Locate the cause of an infeasible model. Each constraint family in
+    # turn gets an elastic slack on every row, and the total slack is
+    # minimised with the other families kept hard. Returns {family: rows},
+    # rows being descriptions of the rows that have to give; a family is
+    # None when relaxing it alone does not restore feasibility. Returns {}
+    # when the model is feasible after all.
+    solver = scheduler.create_model(solver_id)
+    solver.Objective().Clear()
+    keys = row_keys(scheduler)
+
+    # The fixed assignments of an incremental run (see
+    # CourseScheduler.load_previous) become x >= 1 rows, so that they can
+    # be relaxed like a constraint family
+    family_rows = dict(scheduler.family_rows)
+    first = solver.NumConstraints()
+    for key in keys['fixed_assignments']:
+        solver.Add(scheduler.x[key] >= 1)
+    family_rows['fixed_assignments'] = (first, solver.NumConstraints())
+    constraints = solver.constraints()
+
+    # Assignment rows may drop their course and fixed rows their key;
+    # capacity rows may take more than one course per slot
+    dropping = ('add_course_assignment_constraints', 'fixed_assignments')
+    upper = {family: 1 if family in dropping else solver.infinity() for family in RELAXABLE}
+    slacks = {}
+    for family in RELAXABLE:
+        first, last = family_rows[family]
+        slacks[family] = []
+        for row in range(first, last):
+            slack = solver.NumVar(0, 0, f's_{family}_{row}')
+            constraints[row].SetCoefficient(slack, 1 if family in dropping else -1)
+            slacks[family].append(slack)
+    if time_limit is not None:
+        solver.SetTimeLimit(milliseconds(time_limit))
+
+    if MIP_STATUS.get(solver.Solve()) in ('OPTIMAL', 'FEASIBLE'):
+        return {}
+
+    found = {}
+    for family in RELAXABLE:
+        objective = solver.Objective()
+        objective.Clear()
+        for slack in slacks[family]:
+            slack.SetUb(upper[family])
+            objective.SetCoefficient(slack, 1)
+        objective.SetMinimization()
+        with scheduler.report.phase(f'explain_{family}'):
+            status = MIP_STATUS.get(solver.Solve(), 'UNKNOWN')
+        if status in ('OPTIMAL', 'FEASIBLE'):
+            describe = RELAXABLE[family]
+            found[family] = [describe(scheduler, key) for key, slack in zip(keys[family], slacks[family])
+                             if slack.solution_value() > 0.5]
+        else:
+            found[family] = None
+        for slack in slacks[family]:
+            slack.SetUb(0)
+    return found
+
+
+def print_explanation(found):
+    if not found:
+        print("The model is feasible.")
+        return
+    print("Relaxing one constraint family at a time:")
+    for family, rows in found.items():
+        name = family.removeprefix('add_').removesuffix('_constraints').replace('_', ' ')
+        if rows is None:
+            print(f"  {name}: still infeasible")
+        else:
+            print(f"  {name}: feasible by violating {len(rows)} rows")
+            for row in rows:
+                print(f"    {row}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check the input tables for infeasibility")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--sqlite', metavar='PATH')
+    parser.add_argument('--grid', metavar='PATH', help="JSON time grid (see zaman.TimeGrid.load)")
+    parser.add_argument('--explain', action='store_true',
+                        help="if the checks pass but the model is infeasible, locate the conflict")
+    parser.add_argument('--time-limit', type=float, default=60,
+                        help="per relaxed solve with --explain (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    from proje import CourseScheduler
+    from zaman import TimeGrid
+
+    args = parse_args()
+    scheduler = CourseScheduler(solution_path=None, source=DataSource(args.data_dir, sqlite_path=args.sqlite),
+                                grid=TimeGrid.load(args.grid) if args.grid else None)
+    issues = diagnose(scheduler)
+    for issue in issues:
+        print(issue.message)
+    if not issues:
+        print("No problems found by the quick checks.")
+        if args.explain:
+            print_explanation(explain(scheduler, time_limit=args.time_limit))
@@ -0,0 +1,84 @@
+import os
+import re
+
+import pandas as pd
+import pytest
+
+from bolme import IncumbentMerger, PartitionedBackend, components, to_global, to_local
+from cozucu import CpSatBackend, MipBackend
+from proje import CourseScheduler
+from veri import DataSource
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def two_departments():
+    # The shipped tables twice, as departments A and B that share nothing
+    tables = DataSource(DATA_DIR).read_tables()
+    copies = {name: [] for name in tables}
+    for department in ('A', 'B'):
+        rename = lambda names: re.sub(r'[^;,]+', lambda m: f'{m.group(0).strip()} {department}', names)
+        courses = tables['courses'].assign(department=department)
+        courses['name'] = courses['name'] + f' {department}'
+        courses['possible_teachers'] = courses['possible_teachers'].map(rename)
+        if department == 'B':
+            courses['course_year'] += 10
+        rooms = tables['rooms'].assign(department=department)
+        rooms['name'] = rooms['name'] + f' {department}'
+        teachers = tables['teachers'].copy()
+        teachers['name'] = teachers['name'] + f' {department}'
+        for name, table in (('courses', courses), ('rooms', rooms), ('teachers', teachers)):
+            copies[name].append(table)
+    return {name: pd.concat(parts, ignore_index=True) for name, parts in copies.items()}
+
+
+def test_keys_map_between_component_and_global():
+    ids = ([4, 7], [2, 5, 9], [1])
+    assert to_global(ids, (1, 2, 0, 3, 6)) == (7, 9, 1, 3, 6)
+    # Keys of teachers or rooms outside the component are dropped
+    assert to_local(ids, [(7, 9, 1, 3, 6), (4, 3, 1, 0, 0), (4, 2, 0, 0, 0)]) == [(1, 2, 0, 3, 6)]
+
+
+def test_merger_waits_for_every_part_and_keeps_the_best():
+    merged = []
+    merger = IncumbentMerger(2, listener=lambda objective, bound: merged.append((objective, bound)))
+    merger.add(0, 10, 12, [])
+    assert merged == []
+    merger.add(1, 5, None, [])
+    merger.add(0, 8, 12, [])
+    merger.add(0, 11, 12, [])
+    assert merged == [(15, 17), (16, 17)]
+
+
+def test_shipped_data_is_one_component():
+    scheduler = CourseScheduler(solution_path=None, data_dir=DATA_DIR)
+    assert [sorted(part) for part in components(scheduler.data)] == [list(range(len(scheduler.data.course_names)))]
+    solution = PartitionedBackend(MipBackend()).solve(scheduler)
+    assert solution.status == 'OPTIMAL'
+    assert solution.objective == pytest.approx(239)
+
+
+def test_departments_solve_apart():
+    scheduler = CourseScheduler(solution_path=None, tables=two_departments())
+    courses = len(scheduler.data.course_names)
+    assert sorted(len(part) for part in components(scheduler.data)) == [courses // 2, courses // 2]
+    solution = PartitionedBackend(MipBackend()).solve(scheduler)
+    assert solution.status == 'OPTIMAL'
+    assert solution.objective == pytest.approx(2 * 239)
+    assert len(scheduler.report.solver['components']) == 2
+    # Global keys: every course once, in its own department's rooms
+    assert sorted(key[0] for key in solution.assignments) == list(range(courses))
+    half = len(scheduler.data.room_names) // 2
+    assert all((key[0] < courses // 2) == (key[2] < half) for key in solution.assignments)
+
+
+def test_incumbents_cover_the_whole_instance():
+    scheduler = CourseScheduler(solution_path=None, tables=two_departments())
+    backend = PartitionedBackend(CpSatBackend(time_limit=30))
+    seen = []
+    backend.on_incumbent = lambda objective, bound: seen.append(objective)
+    solution = backend.solve(scheduler)
+    assert solution.found
+    # Merged incumbents of both departments only improve, ending at the result
+    assert seen and seen == sorted(seen)
+    assert seen[-1] == pytest.approx(solution.objective)
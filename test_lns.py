@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from lns import LnsBackend
+from proje import CourseScheduler
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def solve(**options):
+    scheduler = CourseScheduler(solution_path=None, data_dir=DATA_DIR)
+    backend = LnsBackend(**options)
+    solution = backend.solve(scheduler)
+    return scheduler, backend, solution
+
+
+def progress(backend):
+    return [(entry['round'], entry['objective'], entry['neighbourhoods']) for entry in backend.history]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 7])
+def test_reaches_the_optimum(seed):
+    _, _, solution = solve(seed=seed, patience=10)
+    # 239 is optimal (see test_proje); the bound is each course at its best
+    assert solution.status == 'FEASIBLE'
+    assert solution.objective == pytest.approx(239)
+    assert solution.bound >= solution.objective
+
+
+def test_same_seed_same_run():
+    _, first, first_solution = solve(seed=1, patience=10)
+    _, second, second_solution = solve(seed=1, patience=10)
+    assert progress(first) == progress(second)
+    assert first_solution.assignments == second_solution.assignments
+
+
+def test_workers_do_not_change_the_run():
+    _, in_process, solution = solve(seed=1, patience=10, parallel=2, max_workers=1)
+    _, pooled, pooled_solution = solve(seed=1, patience=10, parallel=2, max_workers=2)
+    assert progress(in_process) == progress(pooled)
+    assert solution.assignments == pooled_solution.assignments
+
+
+def test_incumbents_and_gap():
+    seen = []
+    scheduler = CourseScheduler(solution_path=None, data_dir=DATA_DIR)
+    backend = LnsBackend(seed=1, relative_gap=0.01)
+    backend.on_incumbent = lambda objective, bound: seen.append(objective)
+    solution = backend.solve(scheduler)
+    # Stops as soon as 239 is within 1% of the bound of 241
+    assert seen == [entry['objective'] for entry in backend.history] == sorted(seen)
+    assert seen[-1] == solution.objective == pytest.approx(239)
+    assert scheduler.report.solver['rounds'] == backend.history[-1]['round']
+
+
+def test_fixed_courses_stay():
+    scheduler = CourseScheduler(solution_path=None, data_dir=DATA_DIR)
+    _, _, reference = solve(seed=0, patience=5)
+    scheduler.fixed = reference.assignments[:5]
+    solution = LnsBackend(seed=3, patience=5).solve(scheduler)
+    fixed = {key[0]: key for key in scheduler.class_keys(scheduler.fixed)}
+    assert [key for key in scheduler.class_keys(solution.assignments) if key[0] in fixed] == [
+        fixed[key[0]] for key in scheduler.class_keys(solution.assignments) if key[0] in fixed]
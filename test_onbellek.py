@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from cozucu import MipBackend
+from onbellek import ModelCache
+from proje import CourseScheduler
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def solve(cache):
+    scheduler = CourseScheduler(solution_path=None, data_dir=DATA_DIR)
+    return scheduler, MipBackend(cache=cache).solve(scheduler)
+
+
+def test_cached_model_solves_like_a_fresh_one(tmp_path):
+    cache = ModelCache(str(tmp_path))
+    _, fresh = solve(cache)
+    assert len(cache.entries()) == 1
+    scheduler, cached = solve(cache)
+    assert 'load_cached_model' in scheduler.report.to_dict()['phases']
+    assert cached.status == fresh.status == 'OPTIMAL'
+    assert cached.objective == pytest.approx(fresh.objective)
+
+
+@pytest.mark.parametrize('suffix', ['.pb', '.json'])
+def test_corrupt_entry_is_a_miss(tmp_path, suffix):
+    cache = ModelCache(str(tmp_path))
+    scheduler, fresh = solve(cache)
+    path = cache.paths(cache.key(scheduler, 'SCIP'))[suffix == '.json']
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) // 2)
+
+    assert cache.load(cache.key(scheduler, 'SCIP'), scheduler, 'SCIP') is None
+    assert cache.entries() == []
+    _, rebuilt = solve(cache)
+    assert rebuilt.objective == pytest.approx(fresh.objective)
+    assert len(cache.entries()) == 1
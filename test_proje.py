@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+from bolme import PartitionedBackend
+from cozucu import MipBackend
+from proje import CourseScheduler
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class PairwiseScheduler(CourseScheduler):
+    # The model before the per-(year, day, slot) rows: one x1 + x2 <= 1 row
+    # for every two overlapping variables of different mandatory courses of
+    # the same year
+    def add_mandatory_course_constraints(self, solver):
+        by_day = {}
+        for key in self.x:
+            course_idx, _, _, day, _ = key
+            if self.is_elective[course_idx] == 0:
+                by_day.setdefault((self.course_years[course_idx], day), []).append(key)
+        self.pairs = []
+        for keys in by_day.values():
+            for i, key1 in enumerate(keys):
+                footprint1 = self.grid.footprint(key1[4], self.course_slots[key1[0]])
+                for key2 in keys[i + 1:]:
+                    if (key1[0] != key2[0] and
+                        footprint1 & self.grid.footprint(key2[4], self.course_slots[key2[0]])):
+                        self.pairs.append((key1, key2))
+                        solver.Add(self.x[key1] + self.x[key2] <= 1)
+
+
+def solve(scheduler_class):
+    scheduler = scheduler_class(solution_path=None, data_dir=DATA_DIR)
+    solution = MipBackend().solve(scheduler)
+    return scheduler, solution
+
+
+@pytest.fixture(scope='module')
+def aggregated():
+    return solve(CourseScheduler)
+
+
+@pytest.fixture(scope='module')
+def pairwise():
+    return solve(PairwiseScheduler)
+
+
+def test_same_optimum(aggregated, pairwise):
+    (_, solution), (_, reference) = aggregated, pairwise
+    assert solution.status == reference.status == 'OPTIMAL'
+    assert solution.objective == pytest.approx(reference.objective)
+
+
+def test_aggregated_rows_are_smaller(aggregated, pairwise):
+    (scheduler, _), (reference, _) = aggregated, pairwise
+    first, last = scheduler.family_rows['add_mandatory_course_constraints']
+    pairs_first, pairs_last = reference.family_rows['add_mandatory_course_constraints']
+    assert 0 < last - first < pairs_last - pairs_first
+
+
+def test_aggregated_solution_satisfies_pairwise_rows(aggregated, pairwise):
+    (scheduler, solution), (reference, _) = aggregated, pairwise
+    chosen = set(scheduler.class_keys(solution.assignments))
+    assert reference.pairs
+    assert not [pair for pair in reference.pairs if pair[0] in chosen and pair[1] in chosen]
+
+
+def clashing_keys(scheduler):
+    # Two candidates of different mandatory courses of one year that overlap
+    candidates = scheduler.presolve()
+    for key1 in candidates:
+        for key2 in candidates:
+            if (key1[0] != key2[0] and key1[3] == key2[3] and
+                scheduler.is_elective[key1[0]] == scheduler.is_elective[key2[0]] == 0 and
+                scheduler.course_years[key1[0]] == scheduler.course_years[key2[0]] and
+                scheduler.grid.footprint(key1[4], scheduler.course_slots[key1[0]]) &
+                scheduler.grid.footprint(key2[4], scheduler.course_slots[key2[0]])):
+                return [key1, key2]
+
+
+@pytest.mark.parametrize('partitioned', [False, True])
+def test_infeasible_fixed_assignments_are_released(partitioned):
+    scheduler = CourseScheduler(solution_path=None, data_dir=DATA_DIR)
+    scheduler.fixed = clashing_keys(scheduler)
+    backend = PartitionedBackend(MipBackend()) if partitioned else MipBackend()
+    schedule = scheduler.solve(backend)
+    assert schedule is not None
+    assert schedule.status == 'OPTIMAL'
+    assert len(scheduler.fixed) < 2
+
+
+def test_assigned_rooms_never_clash(aggregated):
+    scheduler, solution = aggregated
+    assert any(len(scheduler.data.class_rooms[key[2]]) > 1 for key in scheduler.class_keys(solution.assignments))
+    busy = {}
+    for course_idx, _, room_idx, day, start in solution.assignments:
+        assert room_idx in scheduler.data.course_rooms[course_idx]
+        footprint = scheduler.grid.footprint(start, scheduler.course_slots[course_idx])
+        assert not busy.get((room_idx, day), 0) & footprint
+        busy[(room_idx, day)] = busy.get((room_idx, day), 0) | footprint
+
+
+def test_assigned_rooms_follow_the_hint(aggregated):
+    scheduler, solution = aggregated
+    # A previous run that used the next room of the class everywhere: it
+    # clashes nowhere, so assign_rooms keeps every one of its rooms
+    def next_room(room_idx):
+        rooms = scheduler.data.class_rooms[scheduler.data.room_class[room_idx]]
+        return rooms[(rooms.index(room_idx) + 1) % len(rooms)]
+    previous = [(c, t, next_room(r), d, s) for c, t, r, d, s in solution.assignments]
+    assert previous != solution.assignments
+    hint = scheduler.hint
+    try:
+        scheduler.hint = previous
+        assigned = scheduler.assign_rooms(scheduler.class_keys(solution.assignments))
+    finally:
+        scheduler.hint = hint
+    assert sorted(assigned) == sorted(previous)
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+from cozucu import MipBackend
+from proje import CourseScheduler
+from senaryo import ScenarioScheduler, parse_patch
+from tani import diagnose
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def base():
+    scheduler = CourseScheduler(solution_path=None, data_dir=DATA_DIR)
+    keys = np.array(scheduler.presolve(), dtype=np.int32).reshape(-1, 5)
+    return scheduler, keys
+
+
+def scenario(base, *patches):
+    scheduler, keys = base
+    return ScenarioScheduler(scheduler, keys, [parse_patch(patch, scheduler.data) for patch in patches])
+
+
+def test_no_patches_solve_like_the_base(base):
+    schedule = MipBackend().solve(scenario(base))
+    assert schedule.status == 'OPTIMAL'
+    assert schedule.objective == pytest.approx(239)
+
+
+def test_dropped_sole_teacher_is_named(base):
+    issues = diagnose(scenario(base, {'drop_teacher': 'Nursel Can'}))
+    assert [(issue.kind, issue.subject) for issue in issues if issue.kind == 'no_teacher'] == [
+        ('no_teacher', 'Fizik 1')]
+    assert "its only teacher Nursel Can was dropped" in issues[0].message
+
+
+def test_part_time_without_days_leaves_no_slot(base):
+    # The slot masks diagnose reads must follow the patched availability
+    issues = diagnose(scenario(base, {'part_time': 'Ali Can Karaca', 'days': []}))
+    assert ('no_slot', 'Gömülü Sistemler') in [(issue.kind, issue.subject) for issue in issues]
+
+
+def test_part_time_matches_patched_tables(base):
+    scheduler = scenario(base, {'part_time': 'Ali Can Karaca', 'days': [1, 3]})
+    teacher_idx = scheduler.data.teacher_names.index('Ali Can Karaca')
+    assert not scheduler.availability[teacher_idx, [1, 3, 4]].any()
+    assert not scheduler.preferences[teacher_idx, [1, 3, 4]].any()
+    assert all(key[3] in (0, 2) for key in scheduler.candidates if key[1] == teacher_idx)
+    # The base arrays are left as they were
+    assert base[0].availability[teacher_idx].any()
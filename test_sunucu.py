@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from sunucu import RequestHandler, SchedulingService, parse_job
+from veri import TABLES
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def payload(**options):
+    # The shipped tables as CSV text
+    tables = {}
+    for table in TABLES:
+        with open(os.path.join(DATA_DIR, f'{table}.csv'), encoding='utf-8') as f:
+            tables[table] = f.read()
+    return {'tables': tables, **options}
+
+
+@pytest.fixture(scope='module')
+def url():
+    # One worker, so a second job waits for the first
+    service = SchedulingService(max_workers=1)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def request(url, path, body=None):
+    # (HTTP status, JSON body)
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url + path, data=data)) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_invalid_payloads():
+    with pytest.raises(ValueError, match='tables'):
+        parse_job({'backend': 'scip'})
+    with pytest.raises(ValueError, match='Missing tables: teachers'):
+        parse_job({'tables': {'courses': [], 'rooms': []}})
+    with pytest.raises(ValueError, match='Unknown backend'):
+        parse_job(payload(backend='glpk'))
+    with pytest.raises(ValueError, match='time_limit'):
+        parse_job(payload(time_limit=0))
+
+
+def test_job_is_solved_then_cached(url):
+    code, job = request(url, '/jobs', payload(time_limit=60))
+    assert code == 202
+    code, job = request(url, f"/jobs/{job['id']}?wait=60")
+    assert job['status'] == 'done'
+    assert job['result']['status'] == 'OPTIMAL'
+    assert job['result']['objective'] == pytest.approx(239)
+    assert job['result']['issues'] == []
+
+    code, again = request(url, '/jobs', payload(time_limit=60))
+    assert code == 200
+    assert again['cached'] and again['id'] != job['id']
+    assert again['result']['objective'] == job['result']['objective']
+
+    code, jobs = request(url, '/jobs')
+    assert {job['id'], again['id']} <= {listed['id'] for listed in jobs}
+    assert not [listed for listed in jobs if 'result' in listed]
+    code, health = request(url, '/health')
+    assert health['workers'] == 1 and health['cached_results'] >= 1
+
+
+def test_unschedulable_job_reports_issues(url):
+    body = payload(time_limit=61)
+    body['tables']['courses'] = [{'name': 'Orphan', 'hours': 2, 'students': 10,
+                                  'possible_teachers': 'Nobody', 'is_elective': 0, 'course_year': 1}]
+    code, job = request(url, '/jobs', body)
+    code, job = request(url, f"/jobs/{job['id']}?wait=60")
+    assert job['status'] == 'done'
+    assert job['result']['status'] == 'INFEASIBLE'
+    assert 'Orphan' in job['result']['issues'][0]
+
+
+def test_queued_job_is_cancelled(url):
+    _, first = request(url, '/jobs', payload(time_limit=62))
+    _, second = request(url, '/jobs', payload(time_limit=63))
+    code, cancelled = request(url, f"/jobs/{second['id']}/cancel", {})
+    assert code == 200
+    _, second = request(url, f"/jobs/{second['id']}?wait=60")
+    _, first = request(url, f"/jobs/{first['id']}?wait=60")
+    assert second['status'] == 'cancelled'
+    assert first['status'] == 'done'
+
+
+def test_errors(url):
+    assert request(url, '/jobs/missing')[0] == 404
+    assert request(url, '/nowhere')[0] == 404
+    code, body = request(url, '/jobs', {'tables': {}})
+    assert code == 400 and 'Missing tables' in body['error']
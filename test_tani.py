@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from proje import CourseScheduler
+from tani import diagnose, explain
+from test_proje import clashing_keys
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def scheduler():
+    return CourseScheduler(solution_path=None, data_dir=DATA_DIR)
+
+
+def test_shipped_data_passes(scheduler):
+    assert diagnose(scheduler) == []
+    assert explain(scheduler) == {}
+
+
+def test_unknown_teacher_is_reported(scheduler):
+    scheduler.data.course_teachers[0] = ()
+    issues = diagnose(scheduler)
+    assert [(issue.kind, issue.subject) for issue in issues] == [
+        ('no_teacher', scheduler.data.course_names[0])]
+
+
+def test_clashing_fixed_assignments_are_blamed(scheduler):
+    scheduler.fixed = clashing_keys(scheduler)
+    found = explain(scheduler)
+    # The two keys share a cohort slot and a room: relaxing either family
+    # alone leaves the other clash, dropping one fixed key resolves both
+    assert len(found['fixed_assignments']) == 1
+    assert found['fixed_assignments'][0].startswith('course ')
+    assert [family for family, rows in found.items() if rows is None] == [
+        'add_course_assignment_constraints', 'add_teacher_constraints',
+        'add_room_constraints', 'add_mandatory_course_constraints']
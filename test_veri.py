@@ -0,0 +1,34 @@
+import os
+
+import pandas as pd
+
+from veri import Dataset, DataSource
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_rooms_of_one_capacity_form_a_class():
+    data = Dataset.load(DataSource(DATA_DIR))
+    assert data.room_class == [0] + [1] * 9
+    assert data.class_rooms == {0: (0,), 1: tuple(range(1, 10))}
+    # Every course fits both rooms of DB11's capacity and so both classes
+    assert all(classes == (0, 1) for classes in data.course_classes)
+
+
+def test_facilities_and_departments_split_classes():
+    tables = DataSource(DATA_DIR).read_tables()
+    rooms = tables['rooms'].assign(facilities='', department='')
+    rooms.loc[[2, 3], 'facilities'] = 'lab'
+    rooms.loc[4, 'department'] = 'EE'
+    data = Dataset(tables['courses'], rooms, tables['teachers'])
+    assert data.class_rooms == {0: (0,), 1: (1, 5, 6, 7, 8, 9), 2: (2, 3), 4: (4,)}
+    assert data.room_class[3] == 2
+
+
+def test_small_rooms_are_a_class_of_their_own():
+    tables = DataSource(DATA_DIR).read_tables()
+    rooms = pd.concat([tables['rooms'], pd.DataFrame({'name': ['Z1', 'Z2'], 'capacity': [10, 10]})],
+                      ignore_index=True)
+    data = Dataset(tables['courses'], rooms, tables['teachers'])
+    assert data.class_rooms[10] == (10, 11)
+    assert not [classes for classes in data.course_classes if 10 in classes]
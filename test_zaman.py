@@ -0,0 +1,75 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from cozucu import MipBackend
+from proje import CourseScheduler
+from veri import DataSource
+from zaman import TimeGrid
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_default_grid():
+    grid = TimeGrid()
+    assert grid.slots == 8
+    assert grid.break_mask == 1 << 3
+    assert grid.teaching_slots == 7
+    assert [grid.label(slot) for slot in (0, 3, 7)] == ['09:00', '12:00', '16:00']
+    assert grid.slot_at('13:00') == 4
+    assert grid.starts(3)[-1] == (5, 0b11100000)
+
+
+def test_half_hour_grid():
+    grid = TimeGrid(start='08:30', end='17:30', slot_minutes=30, breaks=[['12:15', '13:00']])
+    assert grid.slots == 18
+    # A break covers every slot it touches
+    assert grid.break_mask == 0b11 << 7
+    assert grid.length(1.5) == 3
+    with pytest.raises(ValueError):
+        grid.length(1.25)
+    with pytest.raises(ValueError):
+        grid.slot_at('08:45')
+    assert grid.slot_at('17:00') == 17
+
+
+def test_invalid_grids():
+    with pytest.raises(ValueError):
+        TimeGrid(start='09:00', end='17:10')
+    with pytest.raises(ValueError):
+        TimeGrid(start='00:00', end='23:00', slot_minutes=15)
+    with pytest.raises(ValueError):
+        TimeGrid(days=8)
+
+
+def test_masks():
+    grid = TimeGrid()
+    matrix = np.array([[[1, 0, 0, 0, 0, 0, 0, 1], [0, 0, 3, 2, 0, 0, 0, 0]]])
+    assert grid.masks(matrix).tolist() == [[0b10000001, 0b1100]]
+    assert (grid.masks(np.ones((2, 8))) == grid.full_mask).all()
+
+
+def test_load_round_trip(tmp_path):
+    grid = TimeGrid(days=6, start='08:30', end='21:00', slot_minutes=30, breaks=[['12:30', '13:30']])
+    path = tmp_path / 'grid.json'
+    path.write_text(json.dumps(grid.to_dict()))
+    assert TimeGrid.load(path).to_dict() == grid.to_dict()
+
+
+def test_half_hour_schedule():
+    # The shipped teachers with every hour split into two half-hour slots
+    tables = DataSource(DATA_DIR).read_tables()
+    tables['teachers'] = tables['teachers'].copy()
+    for column in ('availability', 'preferences'):
+        tables['teachers'][column] = tables['teachers'][column].map(
+            lambda matrix: json.dumps(np.repeat(json.loads(matrix), 2, axis=1).tolist()))
+    scheduler = CourseScheduler(solution_path=None, tables=tables, grid=TimeGrid(slot_minutes=30))
+    solution = MipBackend().solve(scheduler)
+    assert solution.status == 'OPTIMAL'
+    # Scores sum over the slots a course takes, so every score doubles
+    assert solution.objective == pytest.approx(2 * 239)
+    grid = scheduler.grid
+    assert all(not grid.footprint(start, scheduler.course_slots[course_idx]) & grid.break_mask
+               for course_idx, _, _, _, start in solution.assignments)
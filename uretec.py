@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import random
+
+import pandas as pd
+
+TITLES = ['Professor', 'Associate Professor', 'Assistant Professor', 'Lecturer']
+ROOM_SIZES = [30, 46, 50, 80, 120]
+DAYS = 5
+SLOTS = 8  # 9:00 - 17:00, slot 3 being the noon break
+
+
+def matrix_text(matrix):
+    # Same compact list literal as the shipped teachers.csv
+    return json.dumps(matrix, separators=(',', ':'))
+
+
+def generate(courses=30, teachers=30, rooms=10, years=4, elective_ratio=0.3,
+             availability_density=0.8, seed=0):
+    # Build a synthetic instance in the courses/rooms/teachers CSV schema.
+    # Returns the three DataFrames.
+    rng = random.Random(seed)
+
+    capacities = sorted(rng.choice(ROOM_SIZES) for _ in range(rooms))
+    rooms_df = pd.DataFrame({
+        'name': [f'R{idx:03d}' for idx in range(rooms)],
+        'capacity': capacities,
+    })
+
+    teacher_rows = []
+    for idx in range(teachers):
+        availability = [[int(rng.random() < availability_density) for _ in range(SLOTS)]
+                        for _ in range(DAYS)]
+        preferences = [[rng.randint(1, 3) if available else 0 for available in day]
+                       for day in availability]
+        teacher_rows.append({
+            'name': f'Teacher {idx:03d}',
+            'title': rng.choice(TITLES),
+            'availability': matrix_text(availability),
+            'preferences': matrix_text(preferences),
+        })
+    teachers_df = pd.DataFrame(teacher_rows)
+
+    # Every year is one cohort; its courses share the cohort size. Sizes are
+    # drawn below a randomly picked room so that demand for large rooms
+    # follows how many large rooms there are.
+    cohort_sizes = {year: rng.randint(min(20, capacities[0]), rng.choice(capacities))
+                    for year in range(1, years + 1)}
+    course_rows = []
+    for idx in range(courses):
+        year = idx % years + 1
+        is_elective = int(rng.random() < elective_ratio)
+        students = cohort_sizes[year] if not is_elective else rng.randint(10, cohort_sizes[year])
+        possible = rng.sample(teacher_rows, k=min(len(teacher_rows), rng.randint(1, 3)))
+        course_rows.append({
+            'name': f'Course {idx:04d}',
+            'hours': rng.choice([2, 3]),
+            'students': students,
+            'possible_teachers': ';'.join(teacher['name'] for teacher in possible),
+            'is_elective': is_elective,
+            'course_year': year,
+        })
+    courses_df = pd.DataFrame(course_rows)
+
+    return courses_df, rooms_df, teachers_df
+
+
+def write_instance(out_dir, courses_df, rooms_df, teachers_df):
+    os.makedirs(out_dir, exist_ok=True)
+    courses_df.to_csv(os.path.join(out_dir, 'courses.csv'), index=False)
+    rooms_df.to_csv(os.path.join(out_dir, 'rooms.csv'), index=False)
+    teachers_df.to_csv(os.path.join(out_dir, 'teachers.csv'), index=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic scheduling instance")
+    parser.add_argument('--courses', type=int, default=30)
+    parser.add_argument('--teachers', type=int, default=30)
+    parser.add_argument('--rooms', type=int, default=10)
+    parser.add_argument('--years', type=int, default=4)
+    parser.add_argument('--elective-ratio', type=float, default=0.3)
+    parser.add_argument('--density', type=float, default=0.8,
+                        help="share of available teacher slots (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', required=True, help="output directory for the CSV files")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    tables = generate(args.courses, args.teachers, args.rooms, args.years,
+                      args.elective_ratio, args.density, args.seed)
+    write_instance(args.out, *tables)
+    print(f"Wrote {args.courses} courses, {args.teachers} teachers and {args.rooms} rooms to {args.out}")
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+TABLES = ('courses', 'rooms', 'teachers')
+
+
+def parse_matrix(text, name=''):
+    # teachers.csv stores availability/preferences as a days x slots list
+    # literal; parse it as JSON rather than eval'ing the cell
+    try:
+        matrix = np.array(json.loads(text), dtype=np.int8)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid matrix for teacher {name!r}: {e}")
+    if matrix.ndim != 2:
+        raise ValueError(f"Invalid matrix for teacher {name!r}: expected days x slots")
+    return matrix
+
+
+class DataSource:
+    # Where the three input tables live: CSV files (paths configurable) or,
+    # with sqlite_path, tables of the same name in an SQLite database
+    def __init__(self, data_dir='.', courses_path=None, rooms_path=None, teachers_path=None,
+                 sqlite_path=None):
+        self.paths = {
+            'courses': courses_path or os.path.join(data_dir, 'courses.csv'),
+            'rooms': rooms_path or os.path.join(data_dir, 'rooms.csv'),
+            'teachers': teachers_path or os.path.join(data_dir, 'teachers.csv'),
+        }
+        self.sqlite_path = sqlite_path
+
+    def read_table(self, table):
+        if self.sqlite_path:
+            with sqlite3.connect(self.sqlite_path) as connection:
+                return pd.read_sql_query(f'SELECT * FROM {table}', connection)
+        return pd.read_csv(self.paths[table])
+
+    def read_tables(self):
+        return {table: self.read_table(table) for table in TABLES}
+
+    def write_table(self, table, df):
+        # Atomic: a crash mid-write leaves the previous table intact. CSV
+        # files are written next to the target and renamed over it; SQLite
+        # tables are filled under a staging name and swapped in by one
+        # transaction.
+        if self.sqlite_path:
+            staging = f'{table}__staging'
+            connection = sqlite3.connect(self.sqlite_path, isolation_level=None)
+            try:
+                df.to_sql(staging, connection, if_exists='replace', index=False)
+                connection.execute('BEGIN')
+                connection.execute(f'DROP TABLE IF EXISTS {table}')
+                connection.execute(f'ALTER TABLE {staging} RENAME TO {table}')
+                connection.execute('COMMIT')
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                connection.execute(f'DROP TABLE IF EXISTS {staging}')
+                raise
+            finally:
+                connection.close()
+            return
+        path = self.paths[table]
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                        prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+                df.to_csv(f, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(path):
+                os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def write_tables(self, tables):
+        for table, df in tables.items():
+            self.write_table(table, df)
+
+
+class Dataset:
+    # The input tables turned once into parallel typed arrays, indexed by the
+    # row position of each course, room and teacher
+    __slots__ = (
+        'course_names', 'course_hours', 'course_students', 'course_years', 'is_elective',
+        'course_teachers', 'course_rooms', 'course_classes', 'room_names', 'room_capacities',
+        'room_class', 'class_rooms', 'teacher_names', 'teacher_titles', 'availability', 'preferences',
+    )
+
+    def __init__(self, courses_df, rooms_df, teachers_df):
+        self.course_names = courses_df['name'].astype(str).tolist()
+        self.course_hours = courses_df['hours'].to_numpy(dtype=np.int16)
+        self.course_students = courses_df['students'].to_numpy(dtype=np.int32)
+        self.course_years = courses_df['course_year'].to_numpy(dtype=np.int16)
+        self.is_elective = courses_df['is_elective'].to_numpy(dtype=np.int8)
+
+        self.room_names = rooms_df['name'].astype(str).tolist()
+        self.room_capacities = rooms_df['capacity'].to_numpy(dtype=np.int32)
+
+        self.teacher_names = teachers_df['name'].astype(str).tolist()
+        self.teacher_titles = teachers_df['title'].astype(str).tolist()
+        # (teachers x days x slots), slot i being slot i of the time grid (zaman.TimeGrid)
+        self.availability = np.stack([parse_matrix(a, n) for a, n in
+                                      zip(teachers_df['availability'], self.teacher_names)])
+        self.preferences = np.stack([parse_matrix(p, n) for p, n in
+                                     zip(teachers_df['preferences'], self.teacher_names)])
+
+        # Eligible teachers of each course as teacher indices; a name listed in
+        # possible_teachers matches every teacher row carrying it
+        teacher_ids = {}
+        for teacher_idx, name in enumerate(self.teacher_names):
+            teacher_ids.setdefault(name, []).append(teacher_idx)
+        self.course_teachers = []
+        for possible in courses_df['possible_teachers'].astype(str):
+            names = set(possible.split(';'))
+            self.course_teachers.append(tuple(sorted(
+                teacher_idx for name in names for teacher_idx in teacher_ids.get(name, ()))))
+
+        # Rooms each course fits in. With the optional department column on
+        # both tables, a course only uses the rooms of its own department and
+        # the rooms without one.
+        fits = self.room_capacities[None, :] >= self.course_students[:, None]
+        if 'department' in courses_df.columns and 'department' in rooms_df.columns:
+            course_departments = courses_df['department'].fillna('').astype(str).to_numpy()
+            room_departments = rooms_df['department'].fillna('').astype(str).to_numpy()
+            fits &= ((room_departments[None, :] == course_departments[:, None]) |
+                     (room_departments[None, :] == ''))
+        self.course_rooms = [tuple(np.flatnonzero(row).tolist()) for row in fits]
+
+        # Interchangeable rooms: same capacity and the same optional
+        # facilities and department values. room_class maps every room to the
+        # first room of its class, which stands for the whole class in the
+        # model; class_rooms lists the members of each class.
+        attributes = [rooms_df[column].fillna('').astype(str).tolist()
+                      for column in ('facilities', 'department') if column in rooms_df.columns]
+        first = {}
+        self.room_class = []
+        self.class_rooms = {}
+        for room_idx, signature in enumerate(zip(self.room_capacities.tolist(), *attributes)):
+            representative = first.setdefault(signature, room_idx)
+            self.room_class.append(representative)
+            self.class_rooms[representative] = self.class_rooms.get(representative, ()) + (room_idx,)
+        # A class is eligible for a course when its rooms are (eligibility
+        # only depends on the attributes the class shares)
+        self.course_classes = [tuple(sorted({self.room_class[r] for r in rooms})) for rooms in self.course_rooms]
+
+    @classmethod
+    def load(cls, source=None):
+        tables = (source or DataSource()).read_tables()
+        return cls(tables['courses'], tables['rooms'], tables['teachers'])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Copy the CSV inputs into an SQLite database")
+    parser.add_argument('--data-dir', default='.')
+    parser.add_argument('--to-sqlite', metavar='PATH', required=True)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    tables = DataSource(args.data_dir).read_tables()
+    DataSource(sqlite_path=args.to_sqlite).write_tables(tables)
+    print(f"Wrote {', '.join(tables)} to {args.to_sqlite}")
@@ -0,0 +1,117 @@
+import json
+
+import numpy as np
+
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+def minutes(label):
+    # 'HH:MM' -> minutes after midnight
+    try:
+        hours, mins = label.split(':')
+        value = int(hours) * 60 + int(mins)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid time {label!r}: expected HH:MM")
+    if not 0 <= value <= 24 * 60 or not 0 <= int(mins) < 60:
+        raise ValueError(f"Invalid time {label!r}: expected HH:MM")
+    return value
+
+
+def clock(value):
+    # Minutes after midnight -> 'HH:MM'
+    return f'{value // 60:02d}:{value % 60:02d}'
+
+
+class TimeGrid:
+    # The teaching week: `days` days, each split into equal slots from start
+    # to end, minus breaks during which no course may run. Slot i of a day
+    # begins at start + i * slot_minutes, and column i of the availability
+    # and preference matrices in teachers.csv belongs to slot i. A set of
+    # slots of one day is an int bitmask (bit i = slot i), so footprint,
+    # availability and overlap tests are single bitwise operations.
+    MAX_SLOTS = 64  # masks are stored as uint64
+
+    def __init__(self, days=5, start='09:00', end='17:00', slot_minutes=60,
+                 breaks=(('12:00', '13:00'),), day_names=None):
+        self.days = int(days)
+        self.start = minutes(start)
+        self.end = minutes(end)
+        self.slot_minutes = int(slot_minutes)
+        span = self.end - self.start
+        if self.slot_minutes <= 0 or span <= 0 or span % self.slot_minutes:
+            raise ValueError(f"Time grid {start}-{end} is not a whole number of {slot_minutes}-minute slots")
+        self.slots = span // self.slot_minutes
+        if self.slots > self.MAX_SLOTS:
+            raise ValueError(f"Time grid has {self.slots} slots per day, at most {self.MAX_SLOTS} are supported")
+        if day_names is None and self.days > len(DAY_NAMES):
+            raise ValueError(f"Time grid has {self.days} days: give day_names")
+        self.day_names = tuple(day_names or DAY_NAMES[:self.days])
+
+        self.breaks = tuple((minutes(a), minutes(b)) for a, b in breaks)
+        self.full_mask = (1 << self.slots) - 1
+        self.break_mask = 0
+        for slot in range(self.slots):
+            begin = self.slot_time(slot)
+            if any(begin < b and a < begin + self.slot_minutes for a, b in self.breaks):
+                self.break_mask |= 1 << slot
+        self.teaching_mask = self.full_mask & ~self.break_mask
+
+    def slot_time(self, slot):
+        # Minutes after midnight at which a slot begins (slot == slots: end of day)
+        return self.start + slot * self.slot_minutes
+
+    def label(self, slot):
+        return clock(self.slot_time(slot))
+
+    def slot_at(self, label):
+        offset = minutes(label) - self.start
+        if offset % self.slot_minutes or not 0 <= offset < self.slots * self.slot_minutes:
+            raise ValueError(f"{label} is not the start of a slot of the time grid")
+        return offset // self.slot_minutes
+
+    def length(self, hours):
+        # Slots taken by a course of the given length in hours
+        length, rest = divmod(round(float(hours) * 60), self.slot_minutes)
+        if rest:
+            raise ValueError(f"A {hours} hour course is not a whole number of {self.slot_minutes}-minute slots")
+        return length
+
+    @staticmethod
+    def footprint(start, length):
+        return ((1 << length) - 1) << start
+
+    def starts(self, length):
+        # (start slot, footprint) of every start that ends within the day;
+        # footprints overlapping break_mask are not allowed
+        return [(start, self.footprint(start, length)) for start in range(self.slots - length + 1)]
+
+    def masks(self, matrix):
+        # (..., slots) array of 0/1 -> (...) uint64 bitmasks of its nonzero slots
+        bits = (np.asarray(matrix) != 0).astype(np.uint64)
+        return (bits << np.arange(bits.shape[-1], dtype=np.uint64)).sum(axis=-1, dtype=np.uint64)
+
+    @property
+    def teaching_slots(self):
+        # Teaching slots per day
+        return bin(self.teaching_mask).count('1')
+
+    def hours(self, slots):
+        return slots * self.slot_minutes / 60
+
+    def to_dict(self):
+        return {
+            'days': self.days,
+            'start': clock(self.start),
+            'end': clock(self.end),
+            'slot_minutes': self.slot_minutes,
+            'breaks': [[clock(a), clock(b)] for a, b in self.breaks],
+            'day_names': list(self.day_names),
+        }
+
+    @classmethod
+    def load(cls, path):
+        # JSON object with the constructor arguments, e.g.
+        # {"days": 6, "start": "08:30", "end": "21:00", "slot_minutes": 30,
+        #  "breaks": [["12:30", "13:30"]]}
+        with open(path, encoding='utf-8') as f:
+            return cls(**json.load(f))